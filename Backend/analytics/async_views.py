@@ -0,0 +1,62 @@
+import json
+
+from api.async_views import AsyncAPIView
+from api.services.async_reads import run_blocking
+from api.services.versioning import acached_city_result
+from api.views import parse_date_param
+
+from analytics.services.latest_inputs import alatest_inputs
+from analytics.views import (
+    HealthRiskComputeView,
+    HealthRiskForecastView,
+    ScenarioSimulationView,
+    PolicyRankingView
+)
+
+
+async def analyze(payload, city_id, *args, as_of=None):
+    """
+    Read the city's inputs (a single city_features() query, none when
+    cached), then run `payload` on them in a pool thread.
+    """
+    inputs = await alatest_inputs(city_id, as_of)
+    return await run_blocking(payload, *inputs, *args)
+
+
+class AsyncHealthRiskComputeView(AsyncAPIView):
+
+    async def post(self, request, city_id):
+        return self.render(await analyze(HealthRiskComputeView.compute, city_id))
+
+
+class AsyncHealthRiskForecastView(AsyncAPIView):
+
+    async def get(self, request, city_id):
+        as_of = parse_date_param(request, "as_of")
+        return self.render(await acached_city_result(
+            "forecast", city_id, lambda: analyze(HealthRiskForecastView.forecast_payload, city_id, as_of=as_of), as_of
+        ))
+
+
+class AsyncScenarioSimulationView(AsyncAPIView):
+
+    async def post(self, request, city_id):
+        try:
+            scenario = json.loads(request.body or b"{}")
+        except ValueError:
+            return self.render({"detail": "JSON parse error"}, status=400)
+        as_of = parse_date_param(request, "as_of")
+        return self.render(await acached_city_result(
+            "simulate", city_id,
+            lambda: analyze(ScenarioSimulationView.simulation_payload, city_id, scenario, as_of=as_of),
+            scenario, as_of
+        ))
+
+
+class AsyncPolicyRankingView(AsyncAPIView):
+
+    async def get(self, request, city_id):
+        as_of = parse_date_param(request, "as_of")
+        return self.render(await acached_city_result(
+            "policies", city_id, lambda: analyze(PolicyRankingView.ranking_payload, city_id, as_of=as_of), as_of
+        ))
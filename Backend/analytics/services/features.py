@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from api.models import City, CityDataVersion, WeatherData, AirQuality, AgricultureData, TrafficData
+from api.services.versioning import city_cache_key
+
+# Feature vector member -> input table, in the order the analytics functions take them
+FEATURE_MODELS = {
+    'weather': WeatherData,
+    'air': AirQuality,
+    'agri': AgricultureData,
+    'traffic': TrafficData,
+}
+
+CityFeatures = namedtuple('CityFeatures', ['city', *FEATURE_MODELS])
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in ('city_id', 'ingested_at')]
+
+
+def _feature_query(city_ids, as_of):
+    """
+    The cities annotated with every column of their latest row per input
+    table (dated on or before `as_of` when given). Correlated subqueries on
+    (city_id, date), as in City.objects.with_current_risk(): one query.
+    """
+    annotations = {}
+    for key, model in FEATURE_MODELS.items():
+        latest = model.objects.filter(city=OuterRef('pk'))
+        if as_of is not None:
+            latest = latest.filter(date__lte=as_of)
+        latest = latest.order_by('-date', '-id')
+        for column in _columns(model):
+            annotations[f'{key}_{column}'] = Subquery(latest.values(column)[:1])
+    return City.objects.filter(pk__in=city_ids).annotate(**annotations)
+
+
+def _assemble(city):
+    rows = []
+    for key, model in FEATURE_MODELS.items():
+        values = {column: city.__dict__.pop(f'{key}_{column}') for column in _columns(model)}
+        rows.append(model(city=city, **values) if values['id'] is not None else None)
+    return CityFeatures(city, *rows)
+
+
+def city_features(city_ids, as_of=None):
+    """
+    {city_id: CityFeatures(city, weather, air, agri, traffic)} with the latest
+    row of each input table (None where a table has no row for the city);
+    unknown cities are left out. Cached per city data version, so cities
+    read since their last write cost no query at all and the rest share a
+    single one. The rows are unsaved copies: callers may modify them.
+    """
+    city_ids = {int(city_id) for city_id in city_ids}
+    versions = dict(CityDataVersion.objects.filter(city_id__in=city_ids).values_list('city_id', 'version'))
+    keys = {city_id: city_cache_key('features', city_id, versions.get(city_id, 0), as_of) for city_id in city_ids}
+
+    cached = cache.get_many(keys.values())
+    features = {city_id: cached[key] for city_id, key in keys.items() if key in cached}
+
+    missing = city_ids - features.keys()
+    if missing:
+        loaded = {city.pk: _assemble(city) for city in _feature_query(missing, as_of)}
+        cache.set_many({keys[city_id]: value for city_id, value in loaded.items()}, timeout=settings.CITY_CACHE_TIMEOUT)
+        features.update(loaded)
+    return features
@@ -0,0 +1,37 @@
+import copy
+
+from api.models import City
+from api.services.async_reads import run_blocking
+from api.services.memo import memoized
+
+from analytics.services.features import FEATURE_MODELS, city_features
+
+# Input tables, in the order latest_inputs() returns their rows (after the city)
+INPUT_MODELS = tuple(FEATURE_MODELS.values())
+
+
+def _load(city_id, as_of):
+    features = city_features([city_id], as_of).get(int(city_id))
+    if features is None:
+        raise City.DoesNotExist(f"City {city_id} does not exist.")
+    for model, row in zip(INPUT_MODELS, features[1:]):
+        if row is None:
+            raise model.DoesNotExist(f"No {model._meta.verbose_name} for city {city_id}.")
+    return features
+
+
+def latest_inputs(city_id, as_of=None):
+    """
+    (city, weather, air, agri, traffic): the latest row of each input table,
+    or the latest dated on or before `as_of`, from city_features() (one
+    query, cached per data version). Missing data raises DoesNotExist.
+    Shared between the views of one batch request; every caller gets its own
+    copies because simulate_scenario() modifies the rows it is given.
+    """
+    rows = memoized(("latest-inputs", str(city_id), as_of), lambda: _load(city_id, as_of))
+    return tuple(copy.copy(row) for row in rows)
+
+
+async def alatest_inputs(city_id, as_of=None):
+    """latest_inputs() for async views, in a pool thread."""
+    return await run_blocking(latest_inputs, city_id, as_of)
@@ -1,23 +1,27 @@
 import logging
-from api.models import City, WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from api.models import HealthIndex
+from analytics.services.features import city_features
 from analytics.services.health_risk import compute_health_risk
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
-def trigger_risk_calculation(city):
+def trigger_risk_calculation(city, features=None):
     """
     Called after any data ingestion (Weather, AQI, Traffic sync).
     Re-calculates the Health Risk Score for the city and saves it.
+    Pass `features` (from city_features()) when recalculating many cities.
     """
     try:
         # Get latest available data snippet
         today = timezone.now().date()
-        
-        weather = WeatherData.objects.filter(city=city).order_by('-date').first()
-        air = AirQuality.objects.filter(city=city).order_by('-date').first()
-        traffic = TrafficData.objects.filter(city=city).order_by('-date').first()
-        agri = AgricultureData.objects.filter(city=city).order_by('-date').first()
+
+        if features is None:
+            features = city_features([city.pk]).get(city.pk)
+        if features is None:
+            logger.warning(f"Skipping risk calc for {city.city_name}: City no longer exists.")
+            return
+        _, weather, air, agri, traffic = features
 
         # If we miss critical data, use defaults or skip
         if not weather or not air or not traffic:
@@ -1,3 +1,105 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from rest_framework.test import APITransactionTestCase
+
+from api.models import AgricultureData, AirQuality, City, TrafficData, WeatherData
+from api.services import admission
+from api.services.admission import AdmissionGate
+
+from analytics.services.features import city_features
+
+ENDPOINTS = (
+    ('post', 'health-risk'),
+    ('get', 'forecast'),
+    ('post', 'simulate'),
+    ('get', 'policies'),
+)
+
+DAY = datetime.date(2026, 1, 31)
+
+
+def make_city_with_inputs(name='Pune'):
+    """A city with one row in each analytics input table, dated DAY."""
+    city = City.objects.create(city_name=name, state='MH', latitude=18.52, longitude=73.85)
+    WeatherData.objects.create(city=city, date=DAY, temperature=31, humidity=60, rainfall=2)
+    AirQuality.objects.create(city=city, date=DAY, aqi=140, pm25=60, pm10=90, no2=30)
+    AgricultureData.objects.create(city=city, date=DAY, crop_type='Wheat', yield_amount=3.2, soil_moisture=40)
+    TrafficData.objects.create(city=city, date=DAY, traffic_density=7, avg_speed=22)
+    return city
+
+
+class AnalyticsTestCase(APITransactionTestCase):
+    # The async views read in pool threads, which must see the committed rows
+
+    def setUp(self):
+        cache.clear()
+
+
+class AdmissionTests(AnalyticsTestCase):
+
+    def test_a_saturated_gate_answers_503_with_retry_after(self):
+        city = make_city_with_inputs()
+        gate = AdmissionGate('analytics', limit=1, queue_size=0, max_wait=0.5)
+
+        with mock.patch.dict(admission._gates, {'analytics': gate}), gate.admit():
+            for url in (f'/api/analytics/policies/{city.pk}/', f'/api/analytics/async/policies/{city.pk}/'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 503, url)
+                self.assertEqual(response['Retry-After'], '1')
+
+        self.assertEqual(gate.stats()['rejected'], 2)
+        self.assertEqual(self.client.get(f'/api/analytics/policies/{city.pk}/').status_code, 200)
+
+
+class MissingCityTests(AnalyticsTestCase):
+
+    def assertNotFoundEverywhere(self, city_id):
+        for method, endpoint in ENDPOINTS:
+            for prefix in ('', 'async/'):
+                url = f'/api/analytics/{prefix}{endpoint}/{city_id}/'
+                response = getattr(self.client, method)(url)
+                self.assertEqual(response.status_code, 404, url)
+                self.assertEqual(response.json(), {'detail': 'Not found.'}, url)
+
+    def test_unknown_city_is_404_in_sync_and_async_views(self):
+        self.assertNotFoundEverywhere(999)
+
+    def test_city_without_inputs_is_404_in_sync_and_async_views(self):
+        city = City.objects.create(city_name='Nashik', state='MH', latitude=20.0, longitude=73.78)
+        self.assertNotFoundEverywhere(city.pk)
+
+
+class CityFeaturesTests(AnalyticsTestCase):
+
+    def test_cold_cities_share_one_query_and_warm_ones_need_none(self):
+        cities = [make_city_with_inputs(name) for name in ('Pune', 'Nagpur', 'Nashik')]
+        ids = [city.pk for city in cities]
+
+        with self.assertNumQueries(2):  # versions + one feature query
+            cold = city_features(ids)
+        with self.assertNumQueries(1):  # versions only
+            warm = city_features(ids)
+
+        self.assertEqual(set(cold), set(ids))
+        self.assertEqual({city_id: features.air.aqi for city_id, features in warm.items()}, dict.fromkeys(ids, 140))
+
+    def test_missing_rows_are_none_and_unknown_cities_left_out(self):
+        city = City.objects.create(city_name='Nashik', state='MH', latitude=20.0, longitude=73.78)
+        WeatherData.objects.create(city=city, date=DAY, temperature=25, humidity=40, rainfall=0)
+
+        features = city_features([city.pk, 999])
+
+        self.assertEqual(list(features), [city.pk])
+        self.assertEqual(features[city.pk].weather.temperature, 25)
+        self.assertIsNone(features[city.pk].traffic)
+
+    def test_writes_and_as_of_select_the_rows(self):
+        city = make_city_with_inputs()
+        self.assertEqual(city_features([city.pk])[city.pk].weather.temperature, 31)
+
+        WeatherData.objects.create(city=city, date=DAY + datetime.timedelta(days=1), temperature=35, humidity=60, rainfall=0)
+
+        self.assertEqual(city_features([city.pk])[city.pk].weather.temperature, 35)
+        self.assertEqual(city_features([city.pk], DAY)[city.pk].weather.temperature, 31)
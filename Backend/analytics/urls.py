@@ -13,10 +13,22 @@ from .views import (
     ScenarioSimulationView,
     PolicyRankingView
 )
+from .async_views import (
+    AsyncHealthRiskComputeView,
+    AsyncHealthRiskForecastView,
+    AsyncScenarioSimulationView,
+    AsyncPolicyRankingView
+)
 
 urlpatterns = [
     path("health-risk/<int:city_id>/", HealthRiskComputeView.as_view()),
     path("forecast/<int:city_id>/", HealthRiskForecastView.as_view()),
     path("simulate/<int:city_id>/", ScenarioSimulationView.as_view()),
     path("policies/<int:city_id>/", PolicyRankingView.as_view()),
+
+    # Async variants for the ASGI server (concurrent input reads)
+    path("async/health-risk/<int:city_id>/", AsyncHealthRiskComputeView.as_view()),
+    path("async/forecast/<int:city_id>/", AsyncHealthRiskForecastView.as_view()),
+    path("async/simulate/<int:city_id>/", AsyncScenarioSimulationView.as_view()),
+    path("async/policies/<int:city_id>/", AsyncPolicyRankingView.as_view()),
 ]
@@ -2,6 +2,8 @@ from django.shortcuts import render
 
 # Create your views here.
 
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
@@ -12,22 +14,37 @@ from api.models import (
 )
 
 from analytics.services.health_risk import compute_health_risk
+from analytics.services.latest_inputs import latest_inputs
 from analytics.services.urban_forecast import load_model, predict_risk
 from analytics.services.scenario_engine import simulate_scenario
 from analytics.services.policy_ranker import rank_policies
+from api.services.admission import admission_controlled
+from api.services.versioning import cached_city_result
+from api.views import parse_date_param
 
 
 
 
-class HealthRiskComputeView(APIView):
+class AnalyticsView(APIView):
+    """
+    Base of the analytics endpoints: an unknown city, or one without input
+    data, answers 404 like the async variants (AsyncAPIView), not 500.
+    """
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ObjectDoesNotExist):
+            exc = NotFound()
+        return super().handle_exception(exc)
+
+
+class HealthRiskComputeView(AnalyticsView):
 
     def post(self, request, city_id):
-        city = City.objects.get(city_id=city_id)
+        return Response(self.compute(*latest_inputs(city_id)))
 
-        weather = WeatherData.objects.filter(city=city).latest("date")
-        air = AirQuality.objects.filter(city=city).latest("date")
-        agri = AgricultureData.objects.filter(city=city).latest("date")
-        traffic = TrafficData.objects.filter(city=city).latest("date")
+    @staticmethod
+    @admission_controlled("analytics")
+    def compute(city, weather, air, agri, traffic):
 
         score, level = compute_health_risk(weather, air, agri, traffic)
 
@@ -38,23 +55,26 @@ class HealthRiskComputeView(APIView):
             risk_level=level
         )
 
-        return Response({
+        return {
             "city": city.city_name,
             "health_risk_score": score,
             "risk_level": level
-        })
+        }
         
         
-class HealthRiskForecastView(APIView):
+class HealthRiskForecastView(AnalyticsView):
+    """?as_of=YYYY-MM-DD forecasts from the inputs as they stood on that date."""
 
     def get(self, request, city_id):
+        as_of = parse_date_param(request, "as_of")
+        return Response(cached_city_result("forecast", city_id, lambda: self.forecast(city_id, as_of), as_of))
 
-        city = City.objects.get(city_id=city_id)
+    def forecast(self, city_id, as_of=None):
+        return self.forecast_payload(*latest_inputs(city_id, as_of))
 
-        weather = WeatherData.objects.filter(city=city).latest("date")
-        air = AirQuality.objects.filter(city=city).latest("date")
-        agri = AgricultureData.objects.filter(city=city).latest("date")
-        traffic = TrafficData.objects.filter(city=city).latest("date")
+    @staticmethod
+    @admission_controlled("analytics")
+    def forecast_payload(city, weather, air, agri, traffic):
 
         model = load_model()
 
@@ -70,52 +90,61 @@ class HealthRiskForecastView(APIView):
         day3 = predict_risk(model, features)
         day7 = predict_risk(model, features)
 
-        return Response({
+        return {
             "city": city.city_name,
             "current_risk": features,
             "day_3_prediction": day3,
             "day_7_prediction": day7
-        })
+        }
 
 
-class ScenarioSimulationView(APIView):
+class ScenarioSimulationView(AnalyticsView):
+    """?as_of=YYYY-MM-DD applies the scenario to the inputs as they stood on that date."""
+    # POST only carries the scenario; nothing is written, so /api/batch/ may run it
+    batch_safe = True
 
     def post(self, request, city_id):
+        scenario = request.data
+        as_of = parse_date_param(request, "as_of")
+        return Response(cached_city_result(
+            "simulate", city_id, lambda: self.simulate(city_id, scenario, as_of), scenario, as_of
+        ))
 
-        city = City.objects.get(city_id=city_id)
-
-        weather = WeatherData.objects.filter(city=city).latest("date")
-        air = AirQuality.objects.filter(city=city).latest("date")
-        agri = AgricultureData.objects.filter(city=city).latest("date")
-        traffic = TrafficData.objects.filter(city=city).latest("date")
+    def simulate(self, city_id, scenario, as_of=None):
+        return self.simulation_payload(*latest_inputs(city_id, as_of), scenario)
 
-        scenario = request.data
+    @staticmethod
+    @admission_controlled("analytics")
+    def simulation_payload(city, weather, air, agri, traffic, scenario):
 
         new_score, level = simulate_scenario(
             weather, air, agri, traffic, scenario
         )
 
-        return Response({
+        return {
             "city": city.city_name,
             "simulated_risk_score": new_score,
             "risk_level": level
-        })
+        }
 
 
-class PolicyRankingView(APIView):
+class PolicyRankingView(AnalyticsView):
+    """?as_of=YYYY-MM-DD ranks policies on the inputs as they stood on that date."""
 
     def get(self, request, city_id):
+        as_of = parse_date_param(request, "as_of")
+        return Response(cached_city_result("policies", city_id, lambda: self.rank(city_id, as_of), as_of))
 
-        city = City.objects.get(city_id=city_id)
+    def rank(self, city_id, as_of=None):
+        return self.ranking_payload(*latest_inputs(city_id, as_of))
 
-        weather = WeatherData.objects.filter(city=city).latest("date")
-        air = AirQuality.objects.filter(city=city).latest("date")
-        agri = AgricultureData.objects.filter(city=city).latest("date")
-        traffic = TrafficData.objects.filter(city=city).latest("date")
+    @staticmethod
+    @admission_controlled("analytics")
+    def ranking_payload(city, weather, air, agri, traffic):
 
         ranking = rank_policies(weather, air, agri, traffic)
 
-        return Response({
+        return {
             "city": city.city_name,
             "policy_ranking": ranking
-        })
+        }
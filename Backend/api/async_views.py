@@ -0,0 +1,103 @@
+from functools import partial
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+
+from .conditional import aconditional_response, make_etag
+from .models import City, CitySnapshot
+from .renderers import FastJSONRenderer
+from .services.async_reads import gather_blocking, run_blocking
+from .services.history import HISTORY_SERIES, MAX_HISTORY_DAYS, history_days, history_series
+from .services.snapshot import SNAPSHOT_MODELS, dashboard_payload, domain_values, save_snapshot
+from .services.versioning import acached_city_result, city_version
+from .views import parse_date_param
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async (ASGI) variants of the read endpoints under /async/.
+    DRF views are synchronous, so these are plain Django views answering
+    JSON with the same bodies and error shapes as their DRF counterparts.
+    """
+    renderer = FastJSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Same as APIView: no session-based CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            # Same body as DRF's exception handler: field errors as-is, anything else under "detail"
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = self.render(data, status=exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+        except (Http404, ObjectDoesNotExist):
+            return self.render({"detail": "Not found."}, status=404)
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), content_type='application/json', status=status)
+
+
+class AsyncCityDashboardView(AsyncAPIView):
+    """
+    CityDashboardView for the ASGI server: same parameters, cache entries and
+    validators, but a snapshot rebuild (or an &as_of= view) reads its five
+    domains concurrently, as does &history=N.
+    Usage: /api/async/dashboard/?city_id=1
+    """
+    async def get(self, request):
+        city_id = request.GET.get('city_id')
+        if not city_id:
+            return self.render({"error": "city_id parameter is required"}, status=400)
+        try:
+            days = history_days(request.GET.get('history'))
+        except ValueError:
+            return self.render({"error": f"history must be between 1 and {MAX_HISTORY_DAYS} days"}, status=400)
+        as_of = parse_date_param(request, 'as_of')
+
+        version, data_updated_at = await run_blocking(city_version, city_id)
+        etag = make_etag('dashboard', city_id, version, as_of)
+
+        async def build_response():
+            return self.render(await acached_city_result(
+                'dashboard', city_id,
+                lambda: self.build_payload(city_id, days, data_updated_at, as_of),
+                days, as_of, version=version
+            ))
+        return await aconditional_response(request, etag, data_updated_at, build_response)
+
+    async def build_payload(self, city_id, days, data_updated_at, as_of=None):
+        snapshot = None
+        if not as_of:
+            snapshot = await run_blocking(
+                lambda: CitySnapshot.objects.select_related('city').filter(city_id=city_id).first()
+            )
+        if snapshot is None or (data_updated_at and snapshot.updated_at < data_updated_at):
+            city, *domains = await gather_blocking(
+                partial(get_object_or_404, City, pk=city_id),
+                *(partial(domain_values, model, city_id, as_of) for model in SNAPSHOT_MODELS),
+            )
+            values = {}
+            for domain in domains:
+                values.update(domain)
+            if as_of:
+                snapshot = CitySnapshot(city=city, **values)
+            else:
+                snapshot = await run_blocking(save_snapshot, city.pk, values)
+                snapshot.city = city
+
+        data = dashboard_payload(snapshot)
+        if days:
+            series = await gather_blocking(*(partial(history_series, snapshot, key, days) for key in HISTORY_SERIES))
+            data["history"] = {'days': days, **dict(zip(HISTORY_SERIES, series))}
+        return data
@@ -0,0 +1,81 @@
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .models import CityDataVersion
+from .services.versioning import city_version
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def city_data_validators(city_id, *parts):
+    """
+    (etag, last_modified) for a response built from city data, read from the
+    per-city data versions alone: every write to a city's data (ORM or ETL)
+    bumps its version, so no data table is scanned. With a city_id this is
+    that city's (version, updated_at); without one, an aggregate over the
+    version table, which has one row per city, and no Last-Modified (see
+    city_validators()). Extra `parts` (the response format, page bounds...)
+    are mixed into the ETag.
+    """
+    if city_id:
+        version, updated_at = city_version(city_id)
+        return make_etag('city', city_id, version, *parts), updated_at
+    result = CityDataVersion.objects.aggregate(
+        latest=Max('updated_at'),
+        versions=Sum('version'),
+        cities=Count('city_id'),
+    )
+    return make_etag('cities', result['latest'], result['versions'], result['cities'], *parts), None
+
+
+def city_validators(queryset):
+    """
+    (etag, last_modified) for responses covering a set of cities, from one
+    aggregate over the city/data-version join. Any write to any listed city's
+    data (ORM or ETL) or a new city moves the newest version timestamp, but
+    deleting a city moves no timestamp, only the count: the ETag covers both,
+    so there is no Last-Modified (If-Modified-Since would answer a stale 304).
+    """
+    result = queryset.order_by().aggregate(
+        latest=Max('data_version__updated_at'),
+        max_id=Max('city_id'),
+        rows=Count('city_id'),
+    )
+    return make_etag('city_data_version', result['latest'], result['max_id'], result['rows']), None
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 when the validators
+    still match; otherwise build the response and attach ETag/Last-Modified.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build_response()
+    return _attach_validators(response, etag, timestamp)
+
+
+async def aconditional_response(request, etag, last_modified, build_response):
+    """conditional_response() for async views: build_response() is awaited."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = await build_response()
+    return _attach_validators(response, etag, timestamp)
+
+
+def _attach_validators(response, etag, timestamp):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.static_snapshots import publish
+
+
+class Command(BaseCommand):
+    help = "Write the static JSON snapshots (dashboards, city list, overview) to STATIC_SNAPSHOT_ROOT."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', type=int, action='append', dest='city_ids',
+                            help="Only republish this city's dashboard (repeatable).")
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_SNAPSHOT_ROOT:
+            raise CommandError("STATIC_SNAPSHOT_ROOT is not set.")
+        count = publish(options['city_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Updated {count} snapshots in {settings.STATIC_SNAPSHOT_ROOT}"))
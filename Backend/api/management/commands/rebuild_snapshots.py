@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.services.snapshot import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-city latest snapshot (CitySnapshot) from the domain tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt snapshots for {count} cities"))
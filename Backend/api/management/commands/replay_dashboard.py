@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import City
+from api.renderers import FastJSONRenderer
+from api.services.snapshot import dashboard_payload, snapshots_as_of
+
+
+def date_arg(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a city's dashboard over a date range: one NDJSON line per day with the "
+        "/api/dashboard/?as_of= body of that day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('city_id', type=int)
+        parser.add_argument('--start', type=date_arg, required=True, help="First day (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date_arg, required=True, help="Last day (YYYY-MM-DD), inclusive.")
+        parser.add_argument('--step', type=int, default=1, help="Days between replayed dates.")
+        parser.add_argument('--chunk-days', type=int, default=366, help="Dates loaded per range read.")
+
+    def handle(self, *args, **options):
+        try:
+            city = City.objects.get(pk=options['city_id'])
+        except City.DoesNotExist:
+            raise CommandError(f"City {options['city_id']} does not exist.")
+        start, end, step = options['start'], options['end'], options['step']
+        if end < start or step < 1:
+            raise CommandError("Expected --start <= --end and --step >= 1.")
+
+        dates = [start + timedelta(days=offset) for offset in range(0, (end - start).days + 1, step)]
+        renderer = FastJSONRenderer()
+        for i in range(0, len(dates), options['chunk_days']):
+            for as_of, snapshot in snapshots_as_of(city, dates[i:i + options['chunk_days']]):
+                line = renderer.render({'as_of': as_of, **dashboard_payload(snapshot)})
+                self.stdout.write(line.decode())
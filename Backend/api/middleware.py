@@ -0,0 +1,179 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import has_vary_header, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from api.services.profiling import profile_call, requested_mode, sampled, save_profile
+from api.services.timing import RequestTimings
+
+try:
+    import brotli
+except ImportError:  # optional: without it every client gets gzip
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+timing_logger = logging.getLogger('api.timing')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that answers with Brotli instead when the client accepts
+    `br` and the brotli package is installed. Streaming responses (exports)
+    always use gzip, which can be compressed chunk by chunk.
+
+    Brotli has no equivalent of the random gzip filename GZipMiddleware adds
+    against BREACH, so it is restricted to responses without secrets: none
+    that render a CSRF token (the browsable API's forms), set cookies or
+    depend on a client's session (Vary: Cookie with a session cookie sent).
+    Those get the padded gzip.
+    """
+    min_length = 200
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            # Events must reach the client as they are written, not as compressor blocks
+            return response
+        accepts_brotli = re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or response.streaming or not accepts_brotli or self.may_hold_secrets(request, response):
+            return super().process_response(request, response)
+
+        if len(response.content) < self.min_length or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # Same weak-ETag rule as GZipMiddleware (RFC 9110 Section 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+    @staticmethod
+    def may_hold_secrets(request, response):
+        # get_token() flags the request whenever a CSRF token was rendered. DRF reads the
+        # session on every request (Vary: Cookie), but without a session cookie it is empty.
+        return bool(
+            request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            or response.cookies
+            or (settings.SESSION_COOKIE_NAME in request.COOKIES and has_vary_header(response, 'Cookie'))
+        )
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    """
+    Per-request performance breakdown for API requests, as a Server-Timing
+    header (visible in the browser's network panel) and one JSON log line on
+    the `api.timing` logger:
+        db         query count and time (every connection, see api/services/timing.py)
+        serialize  serializer time
+        view       the view itself (includes its queries and serialization)
+        render     response rendering after the view (DRF responses)
+        total      everything below this middleware
+    Requests running more than QUERY_BUDGET queries are logged as warnings.
+    Keep it last in MIDDLEWARE so `view` starts right before the view runs.
+    """
+    path_prefix = '/api/'
+
+    def process_request(self, request):
+        if request.path.startswith(self.path_prefix):
+            request.timings = RequestTimings.start()
+            request.timings_started = time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'timings'):
+            request.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook; everything before it is the view
+        if hasattr(request, 'timings'):
+            request.view_finished = time.perf_counter()
+        return response
+
+    def process_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is None:
+            return response
+        RequestTimings.stop()
+        finished = time.perf_counter()
+        view_started = getattr(request, 'view_started', None)
+        view_finished = getattr(request, 'view_finished', finished)
+
+        metrics = [('db', timings.db, f"{timings.queries} quer{'y' if timings.queries == 1 else 'ies'}")]
+        metrics += [(name, seconds, None) for name, seconds in sorted(timings.spans.items())]
+        if view_started is not None:
+            metrics.append(('view', view_finished - view_started, None))
+            if view_finished < finished:
+                metrics.append(('render', finished - view_finished, None))
+        metrics.append(('total', finished - request.timings_started, None))
+
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+            for name, seconds, desc in metrics
+        )
+
+        over_budget = timings.queries > settings.QUERY_BUDGET
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds, _ in metrics},
+            'over_query_budget': over_budget,
+        }
+        timing_logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Runs an API request under a profiler and stores the artifact (see
+    api/services/profiling.py) when the request asks for it with the
+    X-Profile token header or ?profile= as staff, and for a random
+    PROFILE_SAMPLE_RATE share of requests in sampling mode. Explicitly
+    profiled responses name their artifact in X-Profile-Id; fetch it from
+    /api/profiles/<id>/.
+    Profiles cover the synchronous (WSGI) request path: under ASGI requests
+    pass through unprofiled, as their work is spread over several threads.
+    """
+    sync_capable = True
+    async_capable = True
+    path_prefix = '/api/'
+    excluded_prefix = '/api/profiles/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if not request.path.startswith(self.path_prefix) or request.path.startswith(self.excluded_prefix):
+            return self.get_response(request)
+
+        mode = requested_mode(request)
+        explicit = mode is not None
+        if not explicit and sampled():
+            mode = 'sample'
+        if mode is None:
+            return self.get_response(request)
+
+        response, artifact, seconds = profile_call(mode, lambda: self.get_response(request))
+        name = save_profile(request, mode, artifact, seconds)
+        if explicit:
+            response['X-Profile-Id'] = name
+        return response
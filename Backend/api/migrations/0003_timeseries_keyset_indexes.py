@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_weatherdata_ingested_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agriculturedata',
+            index=models.Index(fields=['date', 'id'], name='agriculture_date_5b57c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airquality',
+            index=models.Index(fields=['date', 'id'], name='air_quality_date_00b4c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthindex',
+            index=models.Index(fields=['date', 'id'], name='health_inde_date_356d06_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficdata',
+            index=models.Index(fields=['date', 'id'], name='traffic_dat_date_a6afc8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['date', 'id'], name='weather_dat_date_647902_idx'),
+        ),
+    ]
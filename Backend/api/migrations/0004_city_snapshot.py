@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_timeseries_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitySnapshot',
+            fields=[
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='api.city')),
+                ('weather_date', models.DateField(null=True)),
+                ('temperature', models.FloatField(null=True)),
+                ('humidity', models.FloatField(null=True)),
+                ('rainfall', models.FloatField(null=True)),
+                ('weather_ingested_at', models.DateTimeField(null=True)),
+                ('aqi_date', models.DateField(null=True)),
+                ('aqi', models.SmallIntegerField(null=True)),
+                ('pm25', models.FloatField(null=True)),
+                ('traffic_date', models.DateField(null=True)),
+                ('traffic_density', models.SmallIntegerField(null=True)),
+                ('health_date', models.DateField(null=True)),
+                ('health_risk_score', models.FloatField(null=True)),
+                ('risk_level', models.CharField(max_length=10, null=True)),
+                ('recent_crops', models.JSONField(default=list, help_text='Last 5 agriculture rows, pre-serialized')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'city_snapshot',
+                'managed': True,
+            },
+        ),
+    ]
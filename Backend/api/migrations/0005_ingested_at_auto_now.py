@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_city_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airquality',
+            name='ingested_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='trafficdata',
+            name='ingested_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ingested_at_auto_now'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityDataVersion',
+            fields=[
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to='api.city')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'city_data_version',
+                'managed': True,
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_city_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agriculturedata',
+            name='ingested_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='healthindex',
+            name='ingested_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='agriculturedata',
+            index=models.Index(fields=['ingested_at', 'id'], name='agriculture_ingeste_c6cd4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airquality',
+            index=models.Index(fields=['ingested_at', 'id'], name='air_quality_ingeste_221c6e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthindex',
+            index=models.Index(fields=['ingested_at', 'id'], name='health_inde_ingeste_79451f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficdata',
+            index=models.Index(fields=['ingested_at', 'id'], name='traffic_dat_ingeste_da79db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['ingested_at', 'id'], name='weather_dat_ingeste_3a4fae_idx'),
+        ),
+    ]
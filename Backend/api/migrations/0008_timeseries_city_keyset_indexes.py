@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_ingested_at_watermark'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='agriculturedata',
+            name='agriculture_city_id_0f954c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='airquality',
+            name='air_quality_city_id_736fbc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='healthindex',
+            name='health_inde_city_id_04a413_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trafficdata',
+            name='traffic_dat_city_id_48ee64_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='weatherdata',
+            name='weather_dat_city_id_efb374_idx',
+        ),
+        migrations.AddIndex(
+            model_name='agriculturedata',
+            index=models.Index(fields=['city', 'date', 'id'], name='agriculture_city_id_000cb8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airquality',
+            index=models.Index(fields=['city', 'date', 'id'], name='air_quality_city_id_2f0514_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthindex',
+            index=models.Index(fields=['city', 'date', 'id'], name='health_inde_city_id_6d55e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficdata',
+            index=models.Index(fields=['city', 'date', 'id'], name='traffic_dat_city_id_2b817a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['city', 'date', 'id'], name='weather_dat_city_id_9e668c_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 12:26
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_avg_speed(apps, schema_editor):
+    CitySnapshot = apps.get_model('api', 'CitySnapshot')
+    TrafficData = apps.get_model('api', 'TrafficData')
+    latest = TrafficData.objects.filter(city_id=OuterRef('city_id')).order_by('-date', '-id')
+    CitySnapshot.objects.update(avg_speed=Subquery(latest.values('avg_speed')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_timeseries_city_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='citysnapshot',
+            name='avg_speed',
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(backfill_avg_speed, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,21 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery
+
+
+class CityQuerySet(models.QuerySet):
+
+    def with_current_risk(self):
+        """
+        Annotate each city with its latest HealthIndex level, score and date.
+        Correlated subqueries on (city_id, date) keep this a single query.
+        """
+        latest = HealthIndex.objects.filter(city=OuterRef('pk')).order_by('-date')
+        return self.annotate(
+            latest_risk_level=Subquery(latest.values('risk_level')[:1]),
+            latest_risk_score=Subquery(latest.values('health_risk_score')[:1]),
+            latest_risk_date=Subquery(latest.values('date')[:1]),
+        )
+
 
 class City(models.Model):
     """
@@ -11,6 +28,8 @@ class City(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
 
+    objects = CityQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.city_name}, {self.state}"
 
@@ -35,7 +54,9 @@ class WeatherData(models.Model):
         managed = True
         db_table = 'weather_data'
         indexes = [
-            models.Index(fields=['city', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pagination / export order, all cities
+            models.Index(fields=['city', 'date', 'id']),  # keyset pagination order, per city
+            models.Index(fields=['ingested_at', 'id']),  # ?since= watermark order
         ]
         # Ensure one weather record per city per day
         unique_together = ('city', 'date')
@@ -52,13 +73,15 @@ class AirQuality(models.Model):
     pm25 = models.FloatField(help_text="PM2.5 concentration")
     pm10 = models.FloatField(help_text="PM10 concentration")
     no2 = models.FloatField(help_text="NO2 concentration")
-    ingested_at = models.DateTimeField(auto_now_add=True)
+    ingested_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         managed = True
         db_table = 'air_quality'
         indexes = [
-            models.Index(fields=['city', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pagination / export order, all cities
+            models.Index(fields=['city', 'date', 'id']),  # keyset pagination order, per city
+            models.Index(fields=['ingested_at', 'id']),  # ?since= watermark order
         ]
         unique_together = ('city', 'date')
 
@@ -72,13 +95,15 @@ class TrafficData(models.Model):
     date = models.DateField()
     traffic_density = models.SmallIntegerField(help_text="Congestion level (1-10)")
     avg_speed = models.FloatField(help_text="Average vehicle speed in km/h")
-    ingested_at = models.DateTimeField(auto_now_add=True)
+    ingested_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         managed = True
         db_table = 'traffic_data'
         indexes = [
-            models.Index(fields=['city', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pagination / export order, all cities
+            models.Index(fields=['city', 'date', 'id']),  # keyset pagination order, per city
+            models.Index(fields=['ingested_at', 'id']),  # ?since= watermark order
         ]
         unique_together = ('city', 'date')
 
@@ -93,15 +118,16 @@ class AgricultureData(models.Model):
     crop_type = models.CharField(max_length=50, help_text="Name of the crop (e.g., Wheat, Rice)")
     yield_amount = models.FloatField(db_column='yield', help_text="Yield in ton/ha") # field renamed because 'yield' is a reserved keyword in Python
     soil_moisture = models.FloatField(help_text="Soil moisture percentage")
-    # No ingested_at in provided schema for this table, but assumed good practice? 
-    # Adding based on pattern of other tables, or sticking strictly to schema?
-    # Schema didn't list it for Agro, so I will OMIT it to be strictly compliant.
+    # Not in the original schema; added as the change marker for ?since= delta sync
+    ingested_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         managed = True
         db_table = 'agriculture_data'
         indexes = [
-            models.Index(fields=['city', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pagination / export order, all cities
+            models.Index(fields=['city', 'date', 'id']),  # keyset pagination order, per city
+            models.Index(fields=['ingested_at', 'id']),  # ?since= watermark order
         ]
         # Unique constraint includes crop_type to allow multiple crops per day per city
         unique_together = ('city', 'date', 'crop_type')
@@ -116,11 +142,63 @@ class HealthIndex(models.Model):
     date = models.DateField()
     health_risk_score = models.FloatField(help_text="Risk score 0-100")
     risk_level = models.CharField(max_length=10, help_text="Low / Medium / High")
+    ingested_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         managed = True
         db_table = 'health_index'
         indexes = [
-            models.Index(fields=['city', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pagination / export order, all cities
+            models.Index(fields=['city', 'date', 'id']),  # keyset pagination order, per city
+            models.Index(fields=['ingested_at', 'id']),  # ?since= watermark order
         ]
         unique_together = ('city', 'date')
+
+
+class CitySnapshot(models.Model):
+    """
+    Read model holding the latest values of every domain table for a city.
+    Maintained on write (see api.signals) so the dashboard is one PK read;
+    `manage.py rebuild_snapshots` repopulates it from history.
+    """
+    city = models.OneToOneField(City, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+
+    weather_date = models.DateField(null=True)
+    temperature = models.FloatField(null=True)
+    humidity = models.FloatField(null=True)
+    rainfall = models.FloatField(null=True)
+    weather_ingested_at = models.DateTimeField(null=True)
+
+    aqi_date = models.DateField(null=True)
+    aqi = models.SmallIntegerField(null=True)
+    pm25 = models.FloatField(null=True)
+
+    traffic_date = models.DateField(null=True)
+    traffic_density = models.SmallIntegerField(null=True)
+    avg_speed = models.FloatField(null=True)
+
+    health_date = models.DateField(null=True)
+    health_risk_score = models.FloatField(null=True)
+    risk_level = models.CharField(max_length=10, null=True)
+
+    recent_crops = models.JSONField(default=list, help_text="Last 5 agriculture rows, pre-serialized")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'city_snapshot'
+
+
+class CityDataVersion(models.Model):
+    """
+    Monotonic per-city data version, bumped on every write to a city's data
+    (ORM hooks, bulk loads, the ETL Loader). Response caches key on it, so a
+    bump makes every cached entry for the city unreachable.
+    """
+    city = models.OneToOneField(City, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'city_data_version'
@@ -0,0 +1,164 @@
+import base64
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .serializers import to_columns
+
+
+class DateKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the time-series tables, newest first.
+
+    The cursor is the (date, id) of the last row on the page, so every page is
+    an index range scan with a LIMIT: no OFFSET and no COUNT(*). Usage:
+    /api/weather/?city_id=1&page_size=200, then follow "next".
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering = ('-date', '-id')
+    cursor_fields = ('date', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, *position):
+        raw = '|'.join(str(value) for value in position).encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def parse_position(self, raw):
+        date, pk = raw.split('|')
+        return datetime.date.fromisoformat(date), int(pk)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            return self.parse_position(raw)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def position_filter(self, position):
+        """Rows after `position` in (date, id) descending order."""
+        date, pk = position
+        return Q(date__lt=date) | Q(date=date, id__lt=pk)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns the queryset narrowed to the requested page plus one look-ahead
+        row; the caller serializes it and hands the rows to
+        get_paginated_response(), which trims the extra row.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position:
+            queryset = queryset.filter(self.position_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def get_next_link(self, last_row):
+        cursor = self.encode_cursor(*(last_row[name] for name in self.cursor_fields))
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data, hidden=()):
+        """
+        `hidden` names fields that were only read to build the cursor (a sparse
+        ?fields= list without date/id); they are dropped from the results.
+        """
+        has_next = len(data) > self.page_size
+        results = data[:self.page_size]
+        next_link = self.get_next_link(results[-1]) if has_next else None
+        if hidden:
+            results = [{k: v for k, v in row.items() if k not in hidden} for row in results]
+        return Response({
+            'next': next_link,
+            'results': results,
+        })
+
+    def get_columnar_response(self, names, rows, hidden=()):
+        """Like get_paginated_response() for value tuples, answered as column arrays."""
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        columns = to_columns(rows, names)
+        for name in hidden:
+            del columns[name]
+        return Response({
+            'next': self.get_next_link(dict(zip(names, rows[-1]))) if has_next else None,
+            'columns': columns,
+        })
+
+
+class WatermarkPagination(DateKeysetPagination):
+    """
+    Delta sync for the time-series tables: rows inserted or updated after
+    ?since=<watermark>, oldest change first, from the (ingested_at, id) index.
+    Usage: /api/weather/?since=0, then follow "next" until it is null and
+    keep "watermark" for the next sync.
+
+    Rows younger than `settle_seconds` are held back so a transaction that
+    started earlier but commits later cannot slip behind a watermark.
+    """
+    cursor_query_param = 'since'
+    ordering = ('ingested_at', 'id')
+    cursor_fields = ('ingested_at', 'id')
+    invalid_cursor_message = 'Invalid watermark'
+    initial_watermark = '0'
+    settle_seconds = 5
+
+    def parse_position(self, raw):
+        ingested_at, pk = raw.split('|')
+        parsed = parse_datetime(ingested_at)
+        if parsed is None:
+            raise ValueError(raw)
+        return parsed, int(pk)
+
+    def decode_cursor(self, request):
+        if request.query_params.get(self.cursor_query_param) == self.initial_watermark:
+            return None
+        return super().decode_cursor(request)
+
+    def position_filter(self, position):
+        ingested_at, pk = position
+        return Q(ingested_at__gt=ingested_at) | Q(ingested_at=ingested_at, id__gt=pk)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        settled = timezone.now() - datetime.timedelta(seconds=self.settle_seconds)
+        return super().paginate_queryset(queryset.filter(ingested_at__lte=settled), request, view)
+
+    def get_watermark(self, last_row):
+        if last_row is None:
+            return self.request.query_params.get(self.cursor_query_param) or self.initial_watermark
+        return self.encode_cursor(*(last_row[name] for name in self.cursor_fields))
+
+    def get_paginated_response(self, data, hidden=()):
+        page = data[:self.page_size]
+        watermark = self.get_watermark(page[-1] if page else None)
+        response = super().get_paginated_response(data, hidden)
+        response.data = {'watermark': watermark, **response.data}
+        return response
+
+    def get_columnar_response(self, names, rows, hidden=()):
+        page = rows[:self.page_size]
+        watermark = self.get_watermark(dict(zip(names, page[-1])) if page else None)
+        response = super().get_columnar_response(names, rows, hidden)
+        response.data = {'watermark': watermark, **response.data}
+        return response
@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional: FastJSONRenderer falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: the msgpack format is only offered when installed
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding through orjson when it is installed (the default
+    renderer, see REST_FRAMEWORK in settings). Dates/times and anything orjson
+    does not know are handed to DRF's encoder, so the output is unchanged.
+    Indented (browsable/`; indent=N`) output keeps the stdlib path.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Exports stream their rows directly; this render()
+    only handles regular payloads such as error bodies.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row, cls=encoders.JSONEncoder) + '\n' for row in rows).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV with a header row. See NDJSONRenderer for how exports use it."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if rows:
+            writer.writerow(rows[0].keys())
+            writer.writerows(row.values() for row in rows)
+        return buffer.getvalue().encode()
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """
+    Plain JSON under its own media type / ?format=columnar. Selecting it makes
+    the time-series lists answer with {"columns": {name: [values...]}}.
+    """
+    media_type = 'application/vnd.urbannexus.columnar+json'
+    format = 'columnar'
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Binary MessagePack (?format=msgpack); lists use the columnar layout."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=str)
+
+
+COLUMNAR_RENDERERS = [ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack else [])
+COLUMNAR_FORMATS = {renderer.format for renderer in COLUMNAR_RENDERERS}
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(names, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(names, row))) + '\n'
+
+
+def csv_lines(names, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow(row)
@@ -1,48 +1,130 @@
 from rest_framework import serializers
 from .models import City, WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from .services.timing import timed
+
+
+def to_columns(rows, names):
+    """Transpose value tuples into {name: [values...]} arrays."""
+    transposed = list(zip(*rows)) or [()] * len(names)
+    return {name: list(values) for name, values in zip(names, transposed)}
 
 class CitySerializer(serializers.ModelSerializer):
     current_risk = serializers.SerializerMethodField()
+    current_risk_score = serializers.SerializerMethodField()
+    current_risk_date = serializers.SerializerMethodField()
 
     class Meta:
         model = City
         fields = '__all__'
 
+    @timed('serialize')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+    def _latest_health(self, obj):
+        """
+        Lists use City.objects.with_current_risk(); single objects that were not
+        annotated (e.g. a freshly created city) fall back to one lookup.
+        """
+        if not hasattr(obj, 'latest_risk_level'):
+            latest = obj.health_logs.order_by('-date').first()
+            obj.latest_risk_level = latest.risk_level if latest else None
+            obj.latest_risk_score = latest.health_risk_score if latest else None
+            obj.latest_risk_date = latest.date if latest else None
+        return obj
+
     def get_current_risk(self, obj):
-        latest_health = obj.health_logs.order_by('-date').first()
-        return latest_health.risk_level if latest_health else "Unknown"
+        return self._latest_health(obj).latest_risk_level or "Unknown"
+
+    def get_current_risk_score(self, obj):
+        return self._latest_health(obj).latest_risk_score
+
+    def get_current_risk_date(self, obj):
+        risk_date = self._latest_health(obj).latest_risk_date
+        return risk_date.isoformat() if risk_date else None
 
-class WeatherDataSerializer(serializers.ModelSerializer):
+class TimeSeriesSerializer(serializers.ModelSerializer):
+    """
+    Base serializer for the per-city time-series tables.
+    Besides the normal instance path it can serialize flat ``values_list`` rows,
+    so list endpoints join City once instead of loading it per row.
+    """
     city_name = serializers.ReadOnlyField(source='city.city_name')
-    
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """
+        `fields` (e.g. from ?fields=date,aqi) keeps only those output fields;
+        flat_fields() follows, so the SELECT only reads their columns.
+        """
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise serializers.ValidationError({
+                "fields": f"Unknown field(s): {', '.join(unknown)}. Expected any of: {', '.join(self.fields)}."
+            })
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+    @timed('serialize')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+    def flat_fields(self):
+        """(output name, ORM lookup, converter) for every readable field."""
+        flat = []
+        for field in self._readable_fields:
+            lookup = field.source.replace('.', '__')
+            # values_list() already yields the raw primary key for relations
+            convert = None if isinstance(field, serializers.RelatedField) else field.to_representation
+            flat.append((field.field_name, lookup, convert))
+        return flat
+
+    def iter_values(self, queryset, chunk_size=None):
+        """
+        Yield converted value tuples in flat_fields() order. With a chunk_size
+        rows are streamed through a server-side cursor instead of fetched at once.
+        """
+        flat = self.flat_fields()
+        converters = [convert for _, _, convert in flat]
+        rows = queryset.values_list(*[lookup for _, lookup, _ in flat])
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+
+        for row in rows:
+            yield tuple(
+                convert(value) if convert and value is not None else value
+                for convert, value in zip(converters, row)
+            )
+
+    @timed('serialize')
+    def serialize_queryset(self, queryset):
+        """Same output as ``many=True`` serialization, built from one flat query."""
+        names = [name for name, _, _ in self.flat_fields()]
+        return [dict(zip(names, row)) for row in self.iter_values(queryset)]
+
+class WeatherDataSerializer(TimeSeriesSerializer):
     class Meta:
         model = WeatherData
         fields = '__all__'
 
-class AirQualitySerializer(serializers.ModelSerializer):
-    city_name = serializers.ReadOnlyField(source='city.city_name')
-
+class AirQualitySerializer(TimeSeriesSerializer):
     class Meta:
         model = AirQuality
         fields = '__all__'
 
-class TrafficDataSerializer(serializers.ModelSerializer):
-    city_name = serializers.ReadOnlyField(source='city.city_name')
-
+class TrafficDataSerializer(TimeSeriesSerializer):
     class Meta:
         model = TrafficData
         fields = '__all__'
 
-class AgricultureDataSerializer(serializers.ModelSerializer):
-    city_name = serializers.ReadOnlyField(source='city.city_name')
-
+class AgricultureDataSerializer(TimeSeriesSerializer):
     class Meta:
         model = AgricultureData
         fields = '__all__'
 
-class HealthIndexSerializer(serializers.ModelSerializer):
-    city_name = serializers.ReadOnlyField(source='city.city_name')
-
+class HealthIndexSerializer(TimeSeriesSerializer):
     class Meta:
         model = HealthIndex
         fields = '__all__'
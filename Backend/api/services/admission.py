@@ -0,0 +1,110 @@
+import math
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ServiceOverloaded(APIException):
+    """503 with Retry-After (DRF's exception handler sends `wait` as that header)."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service temporarily overloaded, retry later.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait, detail=None, code=None):
+        self.wait = wait
+        super().__init__(detail, code)
+
+
+class AdmissionGate:
+    """
+    Concurrency limit for one class of expensive work. Up to `limit` calls
+    run at once; up to `queue_size` more wait (at most `max_wait` seconds)
+    for a slot, and anything beyond that is rejected with ServiceOverloaded
+    straight away, so bursts cannot tie up every worker thread.
+
+    Usage:
+        with admission_gate('analytics').admit():
+            ...
+    """
+
+    def __init__(self, name, limit, queue_size, max_wait, retry_after=None):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.retry_after = retry_after or max(1, math.ceil(max_wait))
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._slots = threading.Condition()
+
+    def _reject(self):
+        self.rejected += 1
+        raise ServiceOverloaded(wait=self.retry_after)
+
+    @contextmanager
+    def admit(self):
+        with self._slots:
+            if self.running >= self.limit:
+                if self.waiting >= self.queue_size:
+                    self._reject()
+                self.waiting += 1
+                try:
+                    free = self._slots.wait_for(lambda: self.running < self.limit, timeout=self.max_wait)
+                finally:
+                    self.waiting -= 1
+                if not free:
+                    self._reject()
+            self.running += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._slots:
+                self.running -= 1
+                self._slots.notify()
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'running': self.running,
+            'queue_size': self.queue_size,
+            'queued': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+        }
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def admission_gate(name):
+    """The process-wide gate of an ADMISSION_CLASSES entry."""
+    with _gates_lock:
+        if name not in _gates:
+            config = settings.ADMISSION_CLASSES[name]
+            _gates[name] = AdmissionGate(
+                name, config['limit'], config['queue_size'], config['max_wait'], config.get('retry_after')
+            )
+        return _gates[name]
+
+
+def admission_controlled(name):
+    """Decorator running the wrapped function inside admission_gate(name)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with admission_gate(name).admit():
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def admission_stats():
+    return {name: admission_gate(name).stats() for name in settings.ADMISSION_CLASSES}
@@ -0,0 +1,31 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _closing(fn):
+    @wraps(fn)
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Pool threads outlive the request, so request_finished never closes their connections
+            close_old_connections()
+    return run
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run blocking work (ORM reads, model predictions) in a pool thread of its
+    own instead of the single thread sync_to_async() uses by default, so
+    several calls can overlap. Each call uses (and then releases) its own
+    database connection.
+    """
+    return await sync_to_async(_closing(fn), thread_sensitive=False)(*args, **kwargs)
+
+
+async def gather_blocking(*calls):
+    """Run independent zero-argument callables concurrently; results in call order."""
+    return await asyncio.gather(*(run_blocking(call) for call in calls))
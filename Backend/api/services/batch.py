@@ -0,0 +1,81 @@
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+BATCH_METHODS = ('GET', 'POST')
+
+# Headers of the outer request that must not leak into sub-requests
+SKIPPED_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+def _failure(status, message):
+    return {'status': status, 'body': {'error': message}}
+
+
+def _subrequest(parent, method, path, params, body):
+    request = HttpRequest()
+    request.method = method
+    request.path = request.path_info = path
+    request.META = {key: value for key, value in parent.META.items() if key not in SKIPPED_META}
+    request.META.update(REQUEST_METHOD=method, PATH_INFO=path, QUERY_STRING=params.urlencode())
+    request.GET = params
+    if hasattr(parent, 'user'):
+        request.user = parent.user
+    if method == 'POST':
+        payload = json.dumps(body if body is not None else {}).encode()
+        request.META.update(CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(payload)))
+        request._body = payload
+        request._read_started = True
+    return request
+
+
+def run_subrequest(parent, spec):
+    """
+    Resolve and run one {"method", "path", "params", "body"} sub-request in
+    the current request (same thread, same DB connection) and return
+    {"status": ..., "body": ...}. GET may target any API view; POST only
+    views flagged `batch_safe` (reads that take a body, e.g. simulate).
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('path'), str):
+        return _failure(400, "Each request needs a 'path'.")
+    method = str(spec.get('method', 'GET')).upper()
+    if method not in BATCH_METHODS:
+        return _failure(405, f"Method must be one of: {', '.join(BATCH_METHODS)}.")
+    params = spec.get('params') or {}
+    if not isinstance(params, dict):
+        return _failure(400, "'params' must be an object.")
+
+    url = urlsplit(spec['path'])
+    query = QueryDict(url.query, mutable=True)
+    for key, value in params.items():
+        query.setlist(key, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return _failure(404, f"No endpoint at {url.path}.")
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return _failure(400, f"{url.path} cannot be batched.")
+    if method == 'POST' and not getattr(view_class, 'batch_safe', False):
+        return _failure(405, f"POST to {url.path} is not allowed in a batch.")
+
+    request = _subrequest(parent, method, url.path, query, spec.get('body'))
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except ObjectDoesNotExist:
+        return _failure(404, "Not found.")
+    except Exception:
+        logger.exception("Batched request to %s failed", url.path)
+        return _failure(500, "Internal server error.")
+
+    if not isinstance(response, Response):
+        return _failure(400, f"{url.path} cannot be batched.")
+    return {'status': response.status_code, 'body': response.data}
@@ -0,0 +1,122 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from api.models import City
+from api.services.snapshot import SNAPSHOT_MODELS, refresh_snapshot
+from api.services.versioning import bump_city_versions
+
+
+class KnownCityField(serializers.IntegerField):
+    """`city` primary key checked against a set resolved up front (no query per row)."""
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+    }
+
+    def __init__(self, city_ids, **kwargs):
+        self.city_ids = city_ids
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if value not in self.city_ids:
+            self.fail('does_not_exist', pk_value=data)
+        return value
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def resolve_cities(rows):
+    """Primary keys of the cities a batch refers to that exist: one query."""
+    candidates = {_as_int(row.get('city')) for row in rows if isinstance(row, dict)}
+    candidates.discard(None)
+    return set(City.objects.filter(pk__in=candidates).values_list('pk', flat=True))
+
+
+def row_validator(serializer_class, city_ids):
+    """
+    One serializer instance that validates rows of `serializer_class` without
+    touching the database: the unique_together validators are dropped (the
+    upsert resolves conflicts) and `city` is checked against `city_ids`.
+    """
+    serializer = serializer_class()
+    serializer.validators = []
+    serializer.fields['city'] = KnownCityField(city_ids)
+    return serializer
+
+
+def bulk_upsert(serializer_class, rows):
+    """
+    Validate a batch of readings and insert-or-update the valid ones; see
+    upsert_rows(). Returns the report alone.
+    """
+    return upsert_rows(serializer_class, rows)[0]
+
+
+def upsert_rows(serializer_class, rows):
+    """
+    Validate a batch of readings and insert-or-update the valid ones with one
+    bulk_create(update_conflicts=True) keyed on the model's unique_together.
+
+    Returns ({"created": n, "updated": n, "invalid": n, "results": [...]},
+    city_ids): one outcome per input row, in input order, and the validated
+    primary keys of the cities written to. When two rows share a key the
+    later one wins and the earlier one is reported as "duplicate".
+    bulk_create sends no signals, so city versions and snapshots are
+    refreshed here, once per city.
+    """
+    model = serializer_class.Meta.model
+    key_fields = model._meta.unique_together[0]
+    key_columns = [model._meta.get_field(name).attname for name in key_fields]
+
+    validator = row_validator(serializer_class, resolve_cities(rows))
+    results = [None] * len(rows)
+    pending = {}  # key -> (index, validated data)
+    for index, row in enumerate(rows):
+        try:
+            data = validator.run_validation(row)
+        except serializers.ValidationError as exc:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': exc.detail}
+            continue
+        data['city_id'] = data.pop('city')
+        key = tuple(data[column] for column in key_columns)
+        if key in pending:
+            earlier = pending[key][0]
+            results[earlier] = {'index': earlier, 'status': 'duplicate', 'superseded_by': index}
+        pending[key] = (index, data)
+
+    city_ids = {data['city_id'] for _, data in pending.values()}
+    if pending:
+        dates = {data['date'] for _, data in pending.values()}
+        existing = set(model.objects.filter(city_id__in=city_ids, date__in=dates).values_list(*key_columns))
+
+        objs = [model(**data) for _, data in pending.values()]
+        update_fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in key_fields
+        ]
+        with transaction.atomic():
+            model.objects.bulk_create(
+                objs, update_conflicts=True, unique_fields=key_fields, update_fields=update_fields
+            )
+            bump_city_versions(city_ids)
+            if model in SNAPSHOT_MODELS:
+                for city_id in city_ids:
+                    refresh_snapshot(city_id, models=[model])
+
+        for (key, (index, _)), obj in zip(pending.items(), objs):
+            results[index] = {
+                'index': index,
+                'status': 'updated' if key in existing else 'created',
+                'id': obj.pk,
+            }
+
+    counts = {'created': 0, 'updated': 0, 'invalid': 0}
+    for outcome in results:
+        if outcome['status'] in counts:
+            counts[outcome['status']] += 1
+    return {**counts, 'results': results}, city_ids
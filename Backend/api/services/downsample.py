@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of `threshold` points (first and last always kept)
+    that best preserve the visual shape of the (x, y) series. `x` must be
+    sorted ascending. The loop runs once per output bucket; the work inside
+    each bucket is vectorised.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets for the interior points, delimited by these edges
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket (the final point for the last bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Triangle areas between the last selected point, each candidate and the average
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_dates(dates, values, threshold):
+    """
+    LTTB over a daily series. `dates` is a sequence of datetime.date sorted
+    ascending; returns the indices to keep.
+    """
+    x = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    return lttb_indices(x, values, threshold)
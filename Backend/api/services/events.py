@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import CityDataVersion
+
+logger = logging.getLogger(__name__)
+
+
+class CityEventBroker:
+    """
+    In-process fan-out of city change events to open SSE streams.
+    Publishers are the synchronous write paths (any thread); subscribers are
+    asyncio queues living on the ASGI event loop. A subscriber that falls
+    more than `max_queued` events behind loses the oldest ones; streams only
+    send the newest event per city anyway.
+
+    Writes of this process are reported by bump_city_versions() through
+    changed(). Those of other worker processes and of the ETL loader only
+    show up in the city_data_version table, so while streams are open a
+    watcher thread polls it every CITY_EVENTS_POLL seconds (poll()) and
+    reports the bumps it finds; changed() drops the ones already reported.
+
+    Usage:
+        subscription = city_events.subscribe()      # inside the event loop
+        event = await subscription[1].get()
+        city_events.unsubscribe(subscription)
+    """
+    max_queued = 100
+    # A bump is stamped before its transaction commits, so polls look back this far
+    poll_overlap = timedelta(seconds=5)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._reported = {}  # city_id -> newest updated_at published
+        self._watcher = None
+        self._floor = self._watermark = None
+
+    def subscribe(self):
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queued))
+        with self._lock:
+            self._subscribers.add(subscription)
+            if settings.CITY_EVENTS_POLL > 0 and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='city-events-watch', daemon=True)
+                self._watcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, city_id, **data):
+        event = {'id': next(self._ids), 'city_id': city_id, **data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:  # loop already closed
+                self.unsubscribe((loop, queue))
+
+    def changed(self, city_id, updated_at):
+        """Publish a bump of the city's data version, once however many paths report it."""
+        city_id = int(city_id)
+        with self._lock:
+            reported = self._reported.get(city_id)
+            if reported is not None and reported >= updated_at:
+                return
+            self._reported[city_id] = updated_at
+        self.publish(city_id, updated_at=updated_at.isoformat())
+
+    def poll(self):
+        """
+        Report the version bumps made since the previous poll, by any process.
+        The first poll only notes where the table stands.
+        """
+        versions = CityDataVersion.objects.values_list('city_id', 'updated_at')
+        if self._floor is None:
+            self._floor = self._watermark = versions.aggregate(latest=Max('updated_at'))['latest'] or timezone.now()
+            return
+        since = max(self._floor, self._watermark - self.poll_overlap)
+        for city_id, updated_at in versions.filter(updated_at__gt=since).order_by('updated_at'):
+            self.changed(city_id, updated_at)
+            self._watermark = max(self._watermark, updated_at)
+
+    def _watch(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._watcher = None
+                        self._floor = self._watermark = None
+                        return
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("Polling city data versions failed")
+                    connections.close_all()
+                time.sleep(settings.CITY_EVENTS_POLL)
+        finally:
+            connections.close_all()  # this thread's connections only
+
+    @staticmethod
+    def _offer(queue, event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+city_events = CityEventBroker()
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+from api.models import WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from api.serializers import to_columns
+
+MAX_HISTORY_DAYS = 365
+
+# response key -> (model, snapshot date column or None, metric columns)
+HISTORY_SERIES = {
+    'weather': (WeatherData, 'weather_date', ('temperature', 'humidity', 'rainfall')),
+    'air_quality': (AirQuality, 'aqi_date', ('aqi', 'pm25')),
+    'traffic': (TrafficData, 'traffic_date', ('traffic_density',)),
+    'agriculture': (AgricultureData, None, ('yield_amount',)),
+    'health': (HealthIndex, 'health_date', ('health_risk_score',)),
+}
+
+
+def history_days(value):
+    """Days from a ?history= value (None when absent); ValueError outside 1..MAX_HISTORY_DAYS."""
+    if not value:
+        return None
+    days = int(value) if value.isdigit() else 0
+    if not 1 <= days <= MAX_HISTORY_DAYS:
+        raise ValueError(value)
+    return days
+
+
+def _latest_date(snapshot, date_column):
+    if date_column:
+        return getattr(snapshot, date_column)
+    crops = snapshot.recent_crops
+    return date.fromisoformat(crops[0]['date']) if crops else None
+
+
+def dashboard_history(snapshot, days):
+    """
+    Compact per-domain arrays covering the `days` days up to each domain's
+    latest row (oldest first). The snapshot already knows those latest dates,
+    so this is one bounded (city_id, date) range query per domain.
+    """
+    history = {'days': days}
+    for key in HISTORY_SERIES:
+        history[key] = history_series(snapshot, key, days)
+    return history
+
+
+def history_series(snapshot, key, days):
+    """One domain of dashboard_history()."""
+    model, date_column, metrics = HISTORY_SERIES[key]
+    latest = _latest_date(snapshot, date_column)
+    if latest is None:
+        return to_columns([], ('date', *metrics))
+
+    rows = (
+        model.objects
+        .filter(city_id=snapshot.city_id, date__gt=latest - timedelta(days=days), date__lte=latest)
+        .order_by('date', 'id')
+        .values_list('date', *metrics)
+    )
+    series = to_columns(rows, ('date', *metrics))
+    series['date'] = [d.isoformat() for d in series['date']]
+    return series
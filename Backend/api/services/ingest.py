@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from api.serializers import WeatherDataSerializer, AirQualitySerializer, TrafficDataSerializer
+from api.services.bulk_upsert import upsert_rows
+from api.services.static_snapshots import deferred_publish
+
+logger = logging.getLogger(__name__)
+
+# "type" of an ingested line -> serializer of the table it is written to
+INGEST_SERIALIZERS = {
+    'weather': WeatherDataSerializer,
+    'air_quality': AirQualitySerializer,
+    'traffic': TrafficDataSerializer,
+}
+
+# One slot per concurrently open ingest stream in this process
+writer_slots = threading.BoundedSemaphore(settings.INGEST_MAX_STREAMS)
+
+
+class MicroBatcher:
+    """
+    Buffers readings per table and writes them with one bulk upsert per table
+    per batch. A batch is flushed once it holds `max_rows` readings or its
+    first reading is `max_wait` seconds old, and on close(). The age is
+    checked as lines arrive and, after start(), by a timer thread, so a slow
+    or stalled stream cannot keep readings buffered. Flushes hold a lock, so
+    a slow database slows down how fast the caller reads the stream rather
+    than growing the buffer.
+
+    Usage:
+        batcher = MicroBatcher().start()
+        try:
+            for line_no, line in enumerate(stream, 1):
+                batcher.add_line(line_no, line)
+        finally:
+            batcher.stop()
+        report = batcher.close()
+    """
+    max_reported_errors = 100
+
+    def __init__(self, max_rows=None, max_wait=None, clock=time.monotonic):
+        self.max_rows = max_rows or settings.INGEST_BATCH_ROWS
+        self.max_wait = max_wait if max_wait is not None else settings.INGEST_BATCH_SECONDS
+        self.clock = clock
+        self.buffer = {kind: [] for kind in INGEST_SERIALIZERS}
+        self.line_numbers = {kind: [] for kind in INGEST_SERIALIZERS}
+        self.buffered = 0
+        self.started = None
+        self.report = {'lines': 0, 'batches': 0, 'created': 0, 'updated': 0, 'invalid': 0, 'errors': []}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._timer = None
+
+    def start(self):
+        """Flush aged batches from a timer thread until stop()."""
+        if self.max_wait > 0:
+            self._timer = threading.Thread(target=self._run_timer, name='ingest-flush', daemon=True)
+            self._timer.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+
+    def _run_timer(self):
+        try:
+            while not self._stopped.wait(min(self.max_wait / 4, 1.0)):
+                try:
+                    self.flush_if_due()
+                except Exception:
+                    # The rows stay buffered and the timer keeps going: the next tick
+                    # (or a full batch, or close()) retries them on a fresh connection
+                    logger.exception("Timed ingest flush failed")
+                    connections.close_all()
+        finally:
+            connections.close_all()  # this thread's connections only
+
+    def _error(self, line_no, errors):
+        self.report['invalid'] += 1
+        if len(self.report['errors']) < self.max_reported_errors:
+            self.report['errors'].append({'line': line_no, 'errors': errors})
+
+    def add_line(self, line_no, line):
+        line = line.strip()
+        if not line:
+            return
+        with self._lock:
+            self.report['lines'] += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                self._error(line_no, {'non_field_errors': ['Invalid JSON.']})
+                return
+            kind = row.pop('type', None) if isinstance(row, dict) else None
+            if kind not in INGEST_SERIALIZERS:
+                self._error(line_no, {'type': [f"Expected one of: {', '.join(INGEST_SERIALIZERS)}."]})
+                return
+
+            self.buffer[kind].append(row)
+            self.line_numbers[kind].append(line_no)
+            self.buffered += 1
+            if self.started is None:
+                self.started = self.clock()
+            if self.buffered >= self.max_rows:
+                self.flush()
+            else:
+                self.flush_if_due()
+
+    def flush_if_due(self):
+        with self._lock:
+            if self.buffered and self.clock() - self.started >= self.max_wait:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self.buffered:
+                return
+            with deferred_publish():
+                self._write()
+
+    def _write(self):
+        touched = set()
+        for kind, rows in self.buffer.items():
+            if not rows:
+                continue
+            result, city_ids = upsert_rows(INGEST_SERIALIZERS[kind], rows)
+            self.report['created'] += result['created']
+            self.report['updated'] += result['updated']
+            touched |= city_ids
+            for outcome, line_no in zip(result['results'], self.line_numbers[kind]):
+                if outcome['status'] == 'invalid':
+                    self._error(line_no, outcome['errors'])
+
+        self.buffer = {kind: [] for kind in INGEST_SERIALIZERS}
+        self.line_numbers = {kind: [] for kind in INGEST_SERIALIZERS}
+        self.buffered = 0
+        self.started = None
+        self.report['batches'] += 1
+        recalculate_risk(touched)
+
+    def close(self):
+        self.stop()
+        self.flush()
+        return self.report
+
+
+def recalculate_risk(city_ids):
+    """trigger_risk_calculation() once per city touched by a batch, on features read in one query."""
+    from analytics.services.features import city_features
+    from analytics.services.risk_engine import trigger_risk_calculation
+
+    for features in city_features(city_ids).values():
+        try:
+            trigger_risk_calculation(features.city, features)
+        except Exception as e:
+            logger.error(f"Risk calculation failed for {features.city.city_name}: {e}")
@@ -0,0 +1,17 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def latest_per_city(queryset, per_city=1):
+    """
+    Narrow a time-series queryset to the newest `per_city` rows of every city
+    using ROW_NUMBER() over (city_id ORDER BY date DESC, id DESC).
+    One set-based query whatever the number of cities.
+    """
+    return queryset.annotate(
+        city_rank=Window(
+            RowNumber(),
+            partition_by=F('city_id'),
+            order_by=[F('date').desc(), F('id').desc()],
+        )
+    ).filter(city_rank__lte=per_city)
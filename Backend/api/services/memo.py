@@ -0,0 +1,26 @@
+import contextvars
+from contextlib import contextmanager
+
+_memo = contextvars.ContextVar('request_memo', default=None)
+
+
+@contextmanager
+def request_memo():
+    """
+    Scope in which memoized() lookups are computed once and shared, e.g. by
+    the sub-requests of one /api/batch/ call. Outside it nothing is kept.
+    """
+    token = _memo.set({})
+    try:
+        yield
+    finally:
+        _memo.reset(token)
+
+
+def memoized(key, compute):
+    memo = _memo.get()
+    if memo is None:
+        return compute()
+    if key not in memo:
+        memo[key] = compute()
+    return memo[key]
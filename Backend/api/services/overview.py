@@ -0,0 +1,30 @@
+from api.serializers import CitySerializer
+from api.services.snapshot import current_snapshots
+
+# response key -> {response field: CitySnapshot column} of the latest row
+OVERVIEW_DOMAINS = {
+    'weather': {'date': 'weather_date', 'temperature': 'temperature', 'humidity': 'humidity', 'rainfall': 'rainfall'},
+    'air_quality': {'date': 'aqi_date', 'aqi': 'aqi', 'pm25': 'pm25'},
+    'traffic': {'date': 'traffic_date', 'traffic_density': 'traffic_density', 'avg_speed': 'avg_speed'},
+}
+
+
+def city_overview():
+    """
+    Every city with its current risk (level, score, date) and the latest
+    weather, AQI and traffic row, read from the CitySnapshot read model:
+    cost follows the city count, not the length of the history.
+    """
+    snapshots = list(current_snapshots())
+    for snapshot in snapshots:
+        # What City.objects.with_current_risk() would annotate
+        snapshot.city.latest_risk_level = snapshot.risk_level
+        snapshot.city.latest_risk_score = snapshot.health_risk_score
+        snapshot.city.latest_risk_date = snapshot.health_date
+    cities = CitySerializer([snapshot.city for snapshot in snapshots], many=True).data
+
+    for city, snapshot in zip(cities, snapshots):
+        for key, columns in OVERVIEW_DOMAINS.items():
+            row = {field: getattr(snapshot, column) for field, column in columns.items()}
+            city[key] = row if row['date'] is not None else None
+    return cities
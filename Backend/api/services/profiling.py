@@ -0,0 +1,171 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+# mode -> artifact suffix
+PROFILE_SUFFIXES = {'cprofile': '.pstats', 'sample': '.folded'}
+
+re_profile_name = re.compile(r'^[\w.-]+\.(pstats|folded)$')
+
+_prune_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler for one thread: a daemon thread reads its
+    Python stack from sys._current_frames() every `interval` seconds and
+    counts identical stacks. The result is in the folded format that
+    flamegraph.pl and speedscope read ("outer;inner;leaf count" per line).
+
+    Usage:
+        sampler = StackSampler(threading.get_ident()).start()
+        ...
+        folded = sampler.stop()
+    """
+
+    def __init__(self, thread_id, interval=None):
+        self.thread_id = thread_id
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def requested_mode(request):
+    """
+    Profiling mode this request explicitly asks for, or None: the
+    X-Profile: <PROFILE_TOKEN> header (optionally with X-Profile-Mode:
+    sample), or ?profile=cprofile|sample from a staff user.
+    """
+    mode = request.headers.get('X-Profile-Mode') or request.GET.get('profile')
+    if ('X-Profile' in request.headers or mode) and may_read_profiles(request):
+        return mode if mode in PROFILE_MODES else 'cprofile'
+    return None
+
+
+def sampled():
+    """Whether to sample this request as part of the PROFILE_SAMPLE_RATE share of traffic."""
+    return bool(settings.PROFILE_SAMPLE_RATE) and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def may_read_profiles(request):
+    """Holders of PROFILE_TOKEN (X-Profile header) and staff users."""
+    token = request.headers.get('X-Profile')
+    if token and settings.PROFILE_TOKEN and hmac.compare_digest(token, settings.PROFILE_TOKEN):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_staff)
+
+
+def profile_call(mode, fn):
+    """
+    Run fn() under the given profiler. Returns (result, artifact, seconds);
+    the artifact is folded-stack text or a cProfile.Profile for save_profile().
+    """
+    started = time.perf_counter()
+    if mode == 'sample':
+        sampler = StackSampler(threading.get_ident()).start()
+        try:
+            result = fn()
+        finally:
+            artifact = sampler.stop()
+        return result, artifact, time.perf_counter() - started
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = fn()
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler, time.perf_counter() - started
+
+
+def save_profile(request, mode, artifact, seconds):
+    """
+    Store an artifact under PROFILE_ROOT as
+    <utc time>-<method>-<path>-<ms>ms.<pstats|folded> and keep only the
+    newest PROFILE_KEEP. Returns the file name.
+    """
+    root = Path(settings.PROFILE_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    slug = re.sub(r'[^\w]+', '-', request.path).strip('-')
+    name = f"{stamp}-{request.method}-{slug}-{seconds * 1000:.0f}ms{PROFILE_SUFFIXES[mode]}"
+
+    if mode == 'sample':
+        (root / name).write_text(artifact)
+    else:
+        artifact.dump_stats(root / name)
+    _prune(root)
+    return name
+
+
+def _prune(root):
+    with _prune_lock:
+        profiles = sorted(path for path in root.iterdir() if re_profile_name.match(path.name))
+        for path in profiles[:-settings.PROFILE_KEEP]:
+            path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Stored artifacts, newest first: name, mode, size and creation time."""
+    root = Path(settings.PROFILE_ROOT)
+    if not root.is_dir():
+        return []
+    modes = {suffix: mode for mode, suffix in PROFILE_SUFFIXES.items()}
+    profiles = []
+    for path in sorted(root.iterdir(), reverse=True):
+        if re_profile_name.match(path.name):
+            stat = path.stat()
+            profiles.append({
+                'name': path.name,
+                'mode': modes[path.suffix],
+                'size': stat.st_size,
+                'created_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            })
+    return profiles
+
+
+def profile_path(name):
+    """Path of a stored artifact, or None for unknown (or unsafe) names."""
+    if not re_profile_name.match(name):
+        return None
+    path = Path(settings.PROFILE_ROOT) / name
+    return path if path.is_file() else None
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key onto one execution: the
+    first caller runs fn(), the others block until it finishes and share its
+    result (or exception). Nothing is remembered once the call completes.
+
+    Usage:
+        result, shared = flights.do(key, fn)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def __len__(self):
+        return len(self._calls)
+
+
+flights = SingleFlight()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: the first caller's coroutine runs as a task
+    and later callers with the same key await that task. A leader that is
+    cancelled (client gone) does not cancel the shared work.
+
+    Usage:
+        result, shared = await async_flights.do(key, make_coroutine)
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coroutine_fn):
+        key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = self._tasks[key] = asyncio.ensure_future(coroutine_fn())
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+async_flights = AsyncSingleFlight()
+
+
+def _cache_locked(key, fn):
+    """
+    Cross-process single flight through the shared cache: whoever adds
+    `<key>:lock` computes (fn() is expected to store its result under `key`)
+    and releases the lock when done, even on failure. Everyone else polls
+    for that entry, but no longer than the lock lives: it carries its expiry,
+    so a holder that crashed without releasing it delays the others until
+    then at most, after which they compute directly.
+    """
+    lock_key = f"{key}:lock"
+    timeout = settings.CITY_SINGLE_FLIGHT_TIMEOUT
+    token = uuid.uuid4().hex
+    expires = time.time() + timeout
+    if cache.add(lock_key, (token, expires), timeout=timeout):
+        try:
+            return fn(), False
+        finally:
+            # Past the TTL the lock may already be someone else's
+            if cache.get(lock_key) == (token, expires):
+                cache.delete(lock_key)
+
+    held = cache.get(lock_key)
+    if held is None:
+        remaining = 0
+    elif isinstance(held, tuple):
+        remaining = min(timeout, held[1] - time.time())
+    else:  # a lock without an expiry (older release)
+        remaining = timeout
+    deadline = time.monotonic() + remaining
+    while time.monotonic() < deadline:
+        time.sleep(min(settings.CITY_SINGLE_FLIGHT_POLL, max(deadline - time.monotonic(), 0)))
+        result = cache.get(key)
+        if result is not None:
+            return result, True
+        if cache.get(lock_key) is None:
+            break  # the holder failed or its entry was evicted: compute here
+    return fn(), False
+
+
+def single_flight(key, fn):
+    """
+    (result, shared) for fn() under `key`, computed once however many
+    threads ask at the same time. With CITY_SINGLE_FLIGHT = 'cache' the
+    leaders of different processes also coordinate through the cache.
+    """
+    if settings.CITY_SINGLE_FLIGHT != 'cache':
+        return flights.do(key, fn)
+
+    (result, shared_remotely), shared = flights.do(key, lambda: _cache_locked(key, fn))
+    return result, shared or shared_remotely
@@ -0,0 +1,237 @@
+from bisect import bisect_right
+
+from api.models import City, CityDataVersion, CitySnapshot, WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from api.serializers import AgricultureDataSerializer
+from api.services.latest import latest_per_city
+
+RECENT_CROPS = 5
+
+# snapshot column -> source column, per domain table ("latest row" domains)
+SNAPSHOT_FIELDS = {
+    WeatherData: {
+        'weather_date': 'date',
+        'temperature': 'temperature',
+        'humidity': 'humidity',
+        'rainfall': 'rainfall',
+        'weather_ingested_at': 'ingested_at',
+    },
+    AirQuality: {
+        'aqi_date': 'date',
+        'aqi': 'aqi',
+        'pm25': 'pm25',
+    },
+    TrafficData: {
+        'traffic_date': 'date',
+        'traffic_density': 'traffic_density',
+        'avg_speed': 'avg_speed',
+    },
+    HealthIndex: {
+        'health_date': 'date',
+        'health_risk_score': 'health_risk_score',
+        'risk_level': 'risk_level',
+    },
+}
+
+SNAPSHOT_MODELS = (*SNAPSHOT_FIELDS, AgricultureData)
+
+
+def _empty_values():
+    values = {column: None for fields in SNAPSHOT_FIELDS.values() for column in fields}
+    values['recent_crops'] = []
+    return values
+
+
+def _recent_crops(queryset):
+    return AgricultureDataSerializer().serialize_queryset(queryset.order_by('-date', '-id')[:RECENT_CROPS])
+
+
+def domain_values(model, city_id, as_of=None):
+    """
+    Snapshot columns of one domain for a city, from its newest rows (dated
+    on or before `as_of` when given): one (city_id, date) index lookup.
+    """
+    queryset = model.objects.filter(city_id=city_id)
+    if as_of is not None:
+        queryset = queryset.filter(date__lte=as_of)
+    if model is AgricultureData:
+        return {'recent_crops': _recent_crops(queryset)}
+
+    fields = SNAPSHOT_FIELDS[model]
+    row = queryset.order_by('-date', '-id').values(*fields.values()).first()
+    return _columns(fields, row)
+
+
+def _columns(fields, row):
+    return {column: row[source] if row else None for column, source in fields.items()}
+
+
+def refresh_snapshot(city_id, models=SNAPSHOT_MODELS):
+    """
+    Recompute the given domains (default: all) of one city's snapshot from
+    the newest rows. Each domain is a single (city_id, date) index lookup.
+    """
+    values = {}
+    for model in models:
+        values.update(domain_values(model, city_id))
+    return save_snapshot(city_id, values)
+
+
+def save_snapshot(city_id, values):
+    snapshot, _ = CitySnapshot.objects.update_or_create(city_id=city_id, defaults=values)
+    return snapshot
+
+
+def current_snapshots(city_ids=None):
+    """
+    Current CitySnapshot (city loaded) of the given cities (every city when
+    None), in city_id order. Snapshots older than the city's last data
+    write (ETL loads bypass the ORM hooks) or missing are rebuilt, all in
+    one set-based pass like rebuild_snapshots(): a fixed number of queries
+    however many cities there are or are stale.
+    """
+    cities = City.objects.order_by('pk')
+    snapshots = CitySnapshot.objects.all()
+    versions = CityDataVersion.objects.all()
+    if city_ids is not None:
+        cities = cities.filter(pk__in=city_ids)
+        snapshots = snapshots.filter(city_id__in=city_ids)
+        versions = versions.filter(city_id__in=city_ids)
+    snapshots = {snapshot.city_id: snapshot for snapshot in snapshots}
+    updated_at = dict(versions.values_list('city_id', 'updated_at'))
+
+    cities = list(cities)
+    stale = [
+        city.pk for city in cities
+        if city.pk not in snapshots
+        or (updated_at.get(city.pk) and snapshots[city.pk].updated_at < updated_at[city.pk])
+    ]
+    if stale:
+        snapshots.update((snapshot.city_id, snapshot) for snapshot in _upsert_snapshots(stale))
+
+    for city in cities:
+        snapshot = snapshots[city.pk]
+        snapshot.city = city
+        yield snapshot
+
+
+def snapshot_as_of(city, as_of):
+    """
+    Unsaved CitySnapshot of `city` as it stood on `as_of`: per domain, the
+    latest row dated on or before that day. Feeds dashboard_payload() and
+    history_series() like a stored snapshot; costs the same five lookups.
+    """
+    values = {}
+    for model in SNAPSHOT_MODELS:
+        values.update(domain_values(model, city.pk, as_of))
+    return CitySnapshot(city=city, **values)
+
+
+def _rows_as_of(model, city_id, dates, per_date, columns):
+    """
+    {date: newest `per_date` rows dated on or before it (newest first)} for
+    many dates, from two (city_id, date) range reads: the oldest row any
+    date needs, then every row from there to the last date.
+    """
+    queryset = model.objects.filter(city_id=city_id)
+    floor = (
+        queryset.filter(date__lte=dates[0]).order_by('-date', '-id')
+        .values_list('date', flat=True)[per_date - 1:per_date].first()
+    )
+    queryset = queryset.filter(date__lte=dates[-1])
+    if floor is not None:
+        queryset = queryset.filter(date__gte=floor)
+    rows = list(queryset.order_by('date', 'id').values(*columns))
+    row_dates = [row['date'] for row in rows]
+
+    window = {}
+    for as_of in dates:
+        end = bisect_right(row_dates, as_of)
+        window[as_of] = rows[max(0, end - per_date):end][::-1]
+    return window
+
+
+def snapshots_as_of(city, dates):
+    """
+    snapshot_as_of() for many dates at once (replay tooling): two range
+    reads per domain (plus one for the crop rows) instead of five lookups
+    per date. Returns [(as_of, snapshot)] in date order.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return []
+    values = {as_of: {} for as_of in dates}
+
+    for model, fields in SNAPSHOT_FIELDS.items():
+        window = _rows_as_of(model, city.pk, dates, 1, fields.values())
+        for as_of in dates:
+            values[as_of].update(_columns(fields, window[as_of][0] if window[as_of] else None))
+
+    window = _rows_as_of(AgricultureData, city.pk, dates, RECENT_CROPS, ('id', 'date'))
+    ids = {row['id'] for rows in window.values() for row in rows}
+    crops = {
+        crop['id']: crop
+        for crop in AgricultureDataSerializer().serialize_queryset(AgricultureData.objects.filter(pk__in=ids))
+    }
+    for as_of in dates:
+        values[as_of]['recent_crops'] = [crops[row['id']] for row in window[as_of]]
+
+    return [(as_of, CitySnapshot(city=city, **values[as_of])) for as_of in dates]
+
+
+def rebuild_snapshots(batch_size=500):
+    """
+    Repopulate every city's snapshot from history in bulk: one latest-per-city
+    window query per domain and a single upsert. Returns the number of cities.
+    """
+    return len(_upsert_snapshots(None, batch_size))
+
+
+def _upsert_snapshots(city_ids, batch_size=500):
+    """rebuild_snapshots() for the given cities (every city when None); returns the saved snapshots."""
+    cities = City.objects.all()
+    if city_ids is not None:
+        cities = cities.filter(pk__in=city_ids)
+    values = {city_id: _empty_values() for city_id in cities.values_list('pk', flat=True)}
+
+    def history(model):
+        queryset = model.objects.all()
+        return queryset if city_ids is None else queryset.filter(city_id__in=city_ids)
+
+    for model, fields in SNAPSHOT_FIELDS.items():
+        rows = latest_per_city(history(model)).values('city_id', *fields.values())
+        for row in rows:
+            values[row['city_id']].update({column: row[source] for column, source in fields.items()})
+
+    crops = latest_per_city(history(AgricultureData), per_city=RECENT_CROPS)
+    for crop in AgricultureDataSerializer().serialize_queryset(crops.order_by('city_id', '-date', '-id')):
+        values[crop['city']]['recent_crops'].append(crop)
+
+    snapshots = [CitySnapshot(city_id=city_id, **city_values) for city_id, city_values in values.items()]
+    return CitySnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['city'],
+        update_fields=[*_empty_values(), 'updated_at'],
+    )
+
+
+def dashboard_payload(snapshot):
+    """The /api/dashboard/ response body for a snapshot (with its city loaded)."""
+    s = snapshot
+    return {
+        "city": s.city.city_name,
+        "state": s.city.state,
+        "latest_stats": {
+            "temperature": round(s.temperature, 2) if s.temperature else None,
+            "humidity": round(s.humidity, 2) if s.humidity else None,
+            "rainfall": round(s.rainfall, 2) if s.rainfall else 0,
+            "aqi": s.aqi,
+            "pm25": round(s.pm25, 2) if s.pm25 else None,
+            "traffic_density": s.traffic_density,
+            "health_risk": round(s.health_risk_score, 2) if s.health_risk_score else None,
+            "risk_level": s.risk_level,
+            "weather_updated_at": s.weather_ingested_at,
+        },
+        "recent_crops": s.recent_crops,
+    }
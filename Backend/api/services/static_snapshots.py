@@ -0,0 +1,223 @@
+import atexit
+import contextvars
+import gzip
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from api.models import City, CityDataVersion
+from api.renderers import FastJSONRenderer
+from api.serializers import CitySerializer
+from api.services.overview import city_overview
+from api.services.snapshot import current_snapshots, dashboard_payload
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .json.gz variants are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+renderer = FastJSONRenderer()
+
+_deferred = contextvars.ContextVar('static_snapshots_deferred', default=None)
+
+# Cities changed but not yet published, and the thread publishing them (see cities_changed())
+_queue = threading.Condition()
+_queued = set()
+_publisher = None
+_publish_lock = threading.Lock()
+
+
+def enabled():
+    return bool(settings.STATIC_SNAPSHOT_ROOT)
+
+
+def _stamp_ns(stamp):
+    return round(stamp.timestamp() * 1_000_000) * 1000
+
+
+def write_atomic(path, content, stamp=None, replace_newer=False):
+    """
+    Replace `path` with `content` through a temp file in the same directory
+    and os.replace(), so a reader sees the old file or the new one, never a
+    partial write. Unchanged files are left alone (their mtime/ETag stays).
+    `stamp` is the data version (a CityDataVersion.updated_at) the content
+    was rendered from: it becomes the file's mtime, and a file stamped newer
+    is kept unless `replace_newer`, so a slow publisher cannot put older
+    data back over a newer one's. Returns whether the file was written.
+    """
+    try:
+        if stamp is not None and not replace_newer and path.stat().st_mtime_ns > _stamp_ns(stamp):
+            return False
+        if path.read_bytes() == content:
+            return False
+    except FileNotFoundError:
+        pass
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        if stamp is not None:
+            os.utime(tmp, ns=(_stamp_ns(stamp), _stamp_ns(stamp)))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
+
+
+def write_json(path, data, stamp=None, replace_newer=False):
+    """
+    Write `data` as <path> plus pre-compressed <path>.gz (and <path>.br when
+    brotli is installed) for gzip_static-style serving. The compressed
+    variants go first, so a plain file is never newer than its siblings.
+    `stamp` and `replace_newer` are as in write_atomic().
+    """
+    content = renderer.render(data)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    variants = [(path.with_name(path.name + '.gz'), gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((path.with_name(path.name + '.br'), brotli.compress(content, quality=11)))
+    variants.append((path, content))
+    written = False
+    for target, body in variants:
+        written |= write_atomic(target, body, stamp, replace_newer)
+    return written
+
+
+def publish(city_ids=None):
+    """
+    Write the static JSON files under STATIC_SNAPSHOT_ROOT: the
+    /api/dashboard/ body of each given city (every city when None) as
+    dashboard/<city_id>.json, plus cities.json and overview.json, which
+    span every city. Each file is stamped with the data version it was
+    rendered from (its city's, or the newest of all for the two lists;
+    read first, so the data is at least that new) and files stamped newer
+    by a concurrent publish are left alone. A full publish replaces them
+    regardless (it also follows deletes, which bump no version) and removes
+    dashboard files of deleted cities. Returns how many documents were
+    written or removed.
+    """
+    if not enabled():
+        return 0
+    root = Path(settings.STATIC_SNAPSHOT_ROOT)
+    replace_newer = city_ids is None
+    stamps = dict(CityDataVersion.objects.values_list('city_id', 'updated_at'))
+
+    written = 0
+    published = set()
+    for snapshot in current_snapshots(city_ids):
+        written += write_json(
+            root / 'dashboard' / f'{snapshot.city_id}.json', dashboard_payload(snapshot),
+            stamps.get(snapshot.city_id), replace_newer
+        )
+        published.add(f'{snapshot.city_id}.json')
+    latest = max(stamps.values(), default=None)
+    cities = CitySerializer(City.objects.with_current_risk(), many=True).data
+    written += write_json(root / 'cities.json', cities, latest, replace_newer)
+    written += write_json(root / 'overview.json', city_overview(), latest, replace_newer)
+
+    if city_ids is None:
+        removed = set()
+        for path in (root / 'dashboard').glob('*.json*'):
+            # dot-prefixed names are temp files of writers in flight
+            document = path.name.split('.json')[0] + '.json'
+            if not path.name.startswith('.') and document not in published:
+                path.unlink(missing_ok=True)
+                removed.add(document)
+        written += len(removed)
+    return written
+
+
+def cities_changed(city_ids):
+    """
+    Republish after committed writes to these cities (called by
+    bump_city_versions). Inside deferred_publish() the cities are collected
+    and published once when the block ends. Otherwise they are queued for
+    the process's publisher thread, which waits STATIC_SNAPSHOT_DELAY
+    seconds for the burst to settle and then publishes everything queued
+    at once: writes never render the city list and overview themselves,
+    and a burst of them renders it once. With a delay of 0 (the SQLite
+    default, as SQLite allows one writer at a time) the writing thread
+    publishes the queue itself; concurrent writers wait for it and publish
+    only what it did not already take.
+    """
+    if not enabled():
+        return
+    pending = _deferred.get()
+    if pending is not None:
+        pending.update(city_ids)
+        return
+
+    global _publisher
+    with _queue:
+        _queued.update(city_ids)
+        if settings.STATIC_SNAPSHOT_DELAY > 0:
+            # Also after a fork: the parent's thread does not run in the child
+            if _publisher is None or not _publisher.is_alive():
+                _publisher = threading.Thread(target=_run_publisher, name='static-snapshot-publisher', daemon=True)
+                _publisher.start()
+            _queue.notify()
+            return
+    flush()
+
+
+def _run_publisher():
+    while True:
+        with _queue:
+            _queue.wait_for(lambda: _queued)
+        time.sleep(settings.STATIC_SNAPSHOT_DELAY)
+        try:
+            flush()
+        finally:
+            connections.close_all()
+
+
+def flush():
+    """
+    Publish every queued city now (the publisher thread's job; also run at
+    exit, so a management command's writes are not lost). Failures are
+    logged, never raised: the writes themselves already succeeded.
+    """
+    with _publish_lock:
+        with _queue:
+            city_ids = set(_queued)
+            _queued.clear()
+        if not city_ids:
+            return 0
+        try:
+            return publish(city_ids)
+        except Exception:
+            logger.exception("Publishing static snapshots failed for cities %s", city_ids)
+            return 0
+
+
+atexit.register(flush)
+
+
+@contextmanager
+def deferred_publish():
+    """
+    Scope of a multi-write job (weather sync, an ingest batch) whose writes
+    should be published together once at the end instead of one by one.
+    """
+    pending = set()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        if pending:
+            cities_changed(pending)
@@ -0,0 +1,88 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Where one request's time goes: database queries (count and time) and
+    named spans such as 'serialize', in seconds. Updated from the request
+    thread and from the pool threads async views read in (the context, and
+    with it this object, is copied into them).
+
+    Usage:
+        timings = RequestTimings.start()    # ServerTimingMiddleware does this
+        with timed('serialize'):
+            ...
+        RequestTimings.stop()
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        self.open_spans = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls):
+        timings = cls()
+        _current.set(timings)
+        return timings
+
+    @staticmethod
+    def stop():
+        _current.set(None)
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db += seconds
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block (or decorated function) to span `name`
+    of the current request; a no-op outside one. Nested blocks of the same
+    span (e.g. a list serializer calling its child) are only counted once.
+    """
+    timings = _current.get()
+    if timings is None or name in timings.open_spans:
+        yield
+        return
+    timings.open_spans.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.open_spans.discard(name)
+        timings.add_span(name, time.perf_counter() - started)
+
+
+def time_queries(execute, sql, params, many, context):
+    """Database execute wrapper counting every query of the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver: every connection, including those of the
+    pool threads async views use, runs its queries through time_queries().
+    """
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import CityDataVersion
+from api.services.async_reads import run_blocking
+from api.services.events import city_events
+from api.services.memo import memoized
+from api.services.singleflight import async_flights, single_flight
+from api.services.static_snapshots import cities_changed
+
+# Namespaces of cached per-city results (also the keys of cache_stats())
+CACHE_NAMESPACES = ('dashboard', 'forecast', 'policies', 'simulate')
+
+STATS_KEY = 'city-cache-stats:{namespace}:{outcome}'
+STATS_OUTCOMES = ('hits', 'misses', 'coalesced')
+
+
+def city_version(city_id):
+    """(version, updated_at) of a city's data; (0, None) before its first write."""
+    def lookup():
+        row = CityDataVersion.objects.filter(city_id=city_id).values_list('version', 'updated_at').first()
+        return row or (0, None)
+    return memoized(('city-version', str(city_id)), lookup)
+
+
+def bump_city_versions(city_ids):
+    """
+    Invalidate everything cached for these cities (one statement) and, once
+    the transaction commits, tell open event streams about it and republish
+    their static snapshots.
+
+    The bump is a single INSERT ... ON CONFLICT DO UPDATE, like the ETL
+    Loader's: concurrent first writes to a city cannot both create version 1,
+    and every bump moves updated_at.
+    """
+    city_ids = {int(city_id) for city_id in city_ids}
+    if not city_ids:
+        return
+    now = timezone.now()
+    table = connection.ops.quote_name(CityDataVersion._meta.db_table)
+    rows = ', '.join(['(%s, 1, %s)'] * len(city_ids))
+    params = []
+    for city_id in sorted(city_ids):  # one lock order across writers
+        params += [city_id, connection.ops.adapt_datetimefield_value(now)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (city_id, version, updated_at) VALUES {rows} "
+            f"ON CONFLICT (city_id) DO UPDATE "
+            f"SET version = {table}.version + 1, updated_at = EXCLUDED.updated_at",
+            params,
+        )
+    transaction.on_commit(lambda: _announce(city_ids, now))
+
+
+def _announce(city_ids, updated_at):
+    for city_id in city_ids:
+        city_events.changed(city_id, updated_at)
+    cities_changed(city_ids)
+
+
+def _count(namespace, outcome):
+    key = STATS_KEY.format(namespace=namespace, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def city_cache_key(namespace, city_id, version, *parts):
+    digest = hashlib.md5(json.dumps(parts, sort_keys=True, default=str).encode(), usedforsecurity=False)
+    return f"city:{city_id}:v{version}:{namespace}:{digest.hexdigest()}"
+
+
+def cached_city_result(namespace, city_id, compute, *parts, version=None):
+    """
+    Return compute() for this city, cached under the city's current data
+    version plus any extra key `parts` (query params, request body...).
+    Entries for older versions are never read again and simply expire.
+    Concurrent misses on the same key run compute() once and share the
+    result (see api/services/singleflight.py).
+    """
+    if version is None:
+        version, _ = city_version(city_id)
+    key = city_cache_key(namespace, city_id, version, *parts)
+
+    result = cache.get(key)
+    if result is not None:
+        _count(namespace, 'hits')
+        return result
+
+    result, shared = single_flight(key, lambda: _compute(namespace, key, compute))
+    if shared:
+        _count(namespace, 'coalesced')
+    return result
+
+
+def _compute(namespace, key, compute):
+    _count(namespace, 'misses')
+    result = compute()
+    cache.set(key, result, timeout=settings.CITY_CACHE_TIMEOUT)
+    return result
+
+
+async def acached_city_result(namespace, city_id, acompute, *parts, version=None):
+    """
+    cached_city_result() for async views: same keys and entries, but the
+    miss path awaits acompute() and is coalesced per event loop.
+    """
+    if version is None:
+        version, _ = await run_blocking(city_version, city_id)
+    key = city_cache_key(namespace, city_id, version, *parts)
+
+    result = await cache.aget(key)
+    if result is not None:
+        await run_blocking(_count, namespace, 'hits')
+        return result
+
+    result, shared = await async_flights.do(key, lambda: _acompute(namespace, key, acompute))
+    if shared:
+        await run_blocking(_count, namespace, 'coalesced')
+    return result
+
+
+async def _acompute(namespace, key, acompute):
+    await run_blocking(_count, namespace, 'misses')
+    result = await acompute()
+    await cache.aset(key, result, timeout=settings.CITY_CACHE_TIMEOUT)
+    return result
+
+
+def cache_stats():
+    keys = [
+        STATS_KEY.format(namespace=namespace, outcome=outcome)
+        for namespace in CACHE_NAMESPACES for outcome in STATS_OUTCOMES
+    ]
+    counters = cache.get_many(keys)
+    return {
+        namespace: {
+            outcome: counters.get(STATS_KEY.format(namespace=namespace, outcome=outcome), 0)
+            for outcome in STATS_OUTCOMES
+        }
+        for namespace in CACHE_NAMESPACES
+    }
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+
+from api.models import City
+from api.services.snapshot import SNAPSHOT_MODELS, refresh_snapshot
+from api.services.versioning import bump_city_versions
+
+
+def city_data_written(sender, instance, **kwargs):
+    """
+    Every ORM write to a domain table bumps the city's data version (dropping
+    its cached responses) and refreshes that domain of its CitySnapshot.
+    The version is bumped first so a snapshot is never older than it.
+    """
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is City:
+        # The whole city is being deleted; its snapshot and version go with it
+        return
+    bump_city_versions([instance.city_id])
+    refresh_snapshot(instance.city_id, models=[sender])
+
+
+def city_edited(sender, instance, created, **kwargs):
+    """
+    City names/locations are part of dashboard and list output too, and a
+    new city starts its data version (so list validators see it).
+    """
+    bump_city_versions([instance.pk])
+
+
+post_save.connect(city_edited, sender=City, dispatch_uid='version-city-edit')
+
+for model in SNAPSHOT_MODELS:
+    post_save.connect(city_data_written, sender=model, dispatch_uid=f'city-data-save-{model.__name__}')
+    post_delete.connect(city_data_written, sender=model, dispatch_uid=f'city-data-delete-{model.__name__}')
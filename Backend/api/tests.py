@@ -1,3 +1,1044 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+
+from . import middleware
+from .models import City, CityDataVersion, CitySnapshot, HealthIndex, TrafficData, WeatherData
+from .pagination import DateKeysetPagination, WatermarkPagination
+from .renderers import msgpack
+from .serializers import WeatherDataSerializer
+from .services.admission import AdmissionGate, ServiceOverloaded
+from .services.downsample import lttb_indices
+from .services.events import CityEventBroker, city_events
+from .services.ingest import MicroBatcher
+from .services import static_snapshots
+from .services.singleflight import AsyncSingleFlight, SingleFlight, _cache_locked
+from .services.snapshot import snapshot_as_of, snapshots_as_of
+from .services.versioning import bump_city_versions, cached_city_result
+from .views import BatchView, CityEventsView
+
+DAY = datetime.date(2026, 1, 31)
+
+
+def make_city(name='Pune'):
+    return City.objects.create(city_name=name, state='MH', latitude=18.52, longitude=73.85)
+
+
+def make_weather(city, days, **values):
+    """One WeatherData row per day, the newest dated DAY."""
+    return [
+        WeatherData.objects.create(
+            city=city, date=DAY - datetime.timedelta(days=offset),
+            temperature=values.get('temperature', 20 + offset), humidity=50, rainfall=offset % 3
+        )
+        for offset in range(days)
+    ]
+
+
+def cursor_of(url):
+    return parse_qs(urlsplit(url).query)['cursor'][0]
+
+
+def sorts_rows(queryset):
+    """Whether SQLite's plan sorts the rows instead of reading them from an index in order."""
+    return 'TEMP B-TREE' in queryset.explain()
+
+
+class ApiTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        """Follow "next" links from url; returns every page's results."""
+        pages = []
+        while url:
+            body = self.client.get(url).json()
+            pages.append(body['results'])
+            url = body['next']
+        return pages
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class FlatRowListTests(ApiTestCase):
+
+    def test_rows_match_the_instance_serializer(self):
+        city = make_city()
+        make_weather(city, 3)
+
+        results = self.client.get('/api/weather/').json()['results']
+
+        expected = WeatherDataSerializer(WeatherData.objects.order_by('-date', '-id'), many=True).data
+        self.assertEqual(results, [dict(row) for row in expected])
+        self.assertEqual(results[0]['city_name'], 'Pune')
+
+    def test_query_count_does_not_grow_with_rows(self):
+        make_weather(make_city('A'), 2)
+        few = self.count_queries('/api/weather/')
+        for n in range(5):
+            make_weather(make_city(f'B{n}'), 10)
+        cache.clear()
+        self.assertEqual(self.count_queries('/api/weather/'), few)
+
+
+class CityCurrentRiskTests(ApiTestCase):
+
+    def test_latest_health_row_per_city(self):
+        risky, calm, unknown = make_city('Risky'), make_city('Calm'), make_city('Unknown')
+        HealthIndex.objects.create(city=risky, date=DAY - datetime.timedelta(days=1), health_risk_score=20, risk_level='Low')
+        HealthIndex.objects.create(city=risky, date=DAY, health_risk_score=80, risk_level='High')
+        HealthIndex.objects.create(city=calm, date=DAY, health_risk_score=10, risk_level='Low')
+
+        cities = {row['city_name']: row for row in self.client.get('/api/cities/').json()}
+
+        self.assertEqual(
+            (cities['Risky']['current_risk'], cities['Risky']['current_risk_score'], cities['Risky']['current_risk_date']),
+            ('High', 80, DAY.isoformat())
+        )
+        self.assertEqual(cities['Calm']['current_risk'], 'Low')
+        self.assertEqual((cities['Unknown']['current_risk'], cities['Unknown']['current_risk_score']), ('Unknown', None))
+
+    def test_query_count_does_not_grow_with_cities(self):
+        make_city('A')
+        few = self.count_queries('/api/cities/')
+        for n in range(10):
+            HealthIndex.objects.create(city=make_city(f'B{n}'), date=DAY, health_risk_score=n, risk_level='Low')
+        cache.clear()
+        self.assertEqual(self.count_queries('/api/cities/'), few)
+
+
+class KeysetPaginationTests(ApiTestCase):
+
+    def test_pages_split_rows_sharing_a_date(self):
+        # Three cities report every day, so each date is a three-way tie broken by id
+        cities = [make_city(f'City {n}') for n in range(3)]
+        for city in cities:
+            make_weather(city, 4)
+        expected = list(WeatherData.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+        pages = self.walk('/api/weather/?page_size=5')
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual([row['id'] for page in pages for row in page], expected)
+
+    def test_city_pages_end_without_next(self):
+        city = make_city()
+        make_city('Other').weather_logs.create(date=DAY, temperature=1, humidity=1, rainfall=1)
+        rows = make_weather(city, 4)
+
+        pages = self.walk(f'/api/weather/?city_id={city.pk}&page_size=2')
+
+        self.assertEqual([[row['id'] for row in page] for page in pages], [[rows[0].pk, rows[1].pk], [rows[2].pk, rows[3].pk]])
+
+    def test_page_size_falls_back_and_is_capped(self):
+        make_weather(make_city(), 3)
+        for value, size in (('0', 3), ('-2', 3), ('abc', 3), ('2', 2)):
+            body = self.client.get(f'/api/weather/?page_size={value}').json()
+            self.assertEqual(len(body['results']), size, value)
+
+        request = type('Request', (), {'query_params': {'page_size': '100000'}})
+        self.assertEqual(DateKeysetPagination().get_page_size(request), DateKeysetPagination.max_page_size)
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/weather/?cursor=bm9wZQ').status_code, 404)
+
+    @skipUnless(connection.vendor == 'sqlite', "reads SQLite's query plan")
+    def test_pages_read_an_index_in_order(self):
+        city = make_city()
+        newest_first = WeatherData.objects.order_by('-date', '-id')
+        self.assertFalse(sorts_rows(newest_first[:101]))
+        self.assertFalse(sorts_rows(newest_first.filter(city=city)[:101]))
+
+
+class DownsampleTests(ApiTestCase):
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        y = [0.0] * 100
+        y[37] = 50.0
+        keep = list(lttb_indices(range(100), y, 10))
+
+        self.assertEqual(len(keep), 10)
+        self.assertEqual((keep[0], keep[-1]), (0, 99))
+        self.assertEqual(keep, sorted(keep))
+        self.assertIn(37, keep)
+
+    def test_short_series_is_returned_whole(self):
+        self.assertEqual(list(lttb_indices(range(4), [1, 2, 3, 4], 10)), [0, 1, 2, 3])
+
+    def test_points_endpoint_keeps_the_range_bounds(self):
+        city = make_city()
+        make_weather(city, 60)
+        start = DAY - datetime.timedelta(days=40)
+
+        body = self.client.get(f'/api/weather/?city_id={city.pk}&points=8&start={start}&end={DAY}').json()
+
+        dates = [row['date'] for row in body['results']]
+        self.assertEqual(body['source_points'], 41)
+        self.assertEqual(len(dates), 8)
+        self.assertEqual((min(dates), max(dates)), (start.isoformat(), DAY.isoformat()))
+
+    def test_points_needs_a_city_and_a_sane_count(self):
+        make_weather(make_city(), 5)
+        self.assertEqual(self.client.get('/api/weather/?points=3').status_code, 400)
+        self.assertEqual(self.client.get('/api/weather/?city_id=1&points=2').status_code, 400)
+        self.assertEqual(self.client.get('/api/weather/?city_id=1&points=3&metric=city').status_code, 400)
+
+
+class OverviewTests(ApiTestCase):
+
+    def test_latest_row_per_domain(self):
+        city, empty = make_city(), make_city('Empty')
+        make_weather(city, 5)
+        city.traffic_logs.create(date=DAY, traffic_density=7, avg_speed=22.5)
+        HealthIndex.objects.create(city=city, date=DAY, health_risk_score=64, risk_level='High')
+
+        body = self.client.get('/api/overview/').json()
+
+        self.assertEqual([row['city_name'] for row in body], ['Pune', 'Empty'])
+        self.assertEqual(body[0]['weather'], {'date': DAY.isoformat(), 'temperature': 20.0, 'humidity': 50.0, 'rainfall': 0.0})
+        self.assertEqual(body[0]['traffic'], {'date': DAY.isoformat(), 'traffic_density': 7, 'avg_speed': 22.5})
+        self.assertIsNone(body[0]['air_quality'])
+        self.assertEqual((body[0]['current_risk'], body[0]['current_risk_score']), ('High', 64))
+        self.assertEqual((body[1]['weather'], body[1]['current_risk']), (None, 'Unknown'))
+
+    def test_reads_the_snapshot_not_the_history(self):
+        make_weather(make_city(), 30)
+        self.client.get('/api/overview/')  # builds the snapshot
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/overview/').status_code, 200)
+
+        self.assertFalse([query['sql'] for query in queries if 'weather_data' in query['sql']])
+
+    def test_stale_snapshots_are_rebuilt_in_a_fixed_number_of_queries(self):
+        cities = [make_city(f'City {n}') for n in range(12)]
+        for city in cities:
+            make_weather(city, 1)
+        self.client.get('/api/overview/')
+
+        def etl_load(cities, day, temperature):
+            # Raw rows plus a version bump, like the ETL Loader: no ORM hooks refresh the snapshots
+            WeatherData.objects.bulk_create([
+                WeatherData(city=city, date=day, temperature=temperature, humidity=50, rainfall=0) for city in cities
+            ])
+            bump_city_versions([city.pk for city in cities])
+
+        etl_load(cities[:1], DAY + datetime.timedelta(days=1), 30)
+        one_stale = self.count_queries('/api/overview/')
+        etl_load(cities, DAY + datetime.timedelta(days=2), 40)
+        all_stale = self.count_queries('/api/overview/')
+
+        self.assertEqual(one_stale, all_stale)
+        body = self.client.get('/api/overview/').json()
+        self.assertEqual({row['weather']['temperature'] for row in body}, {40})
+
+
+class ConditionalGetTests(ApiTestCase):
+
+    def test_etag_changes_after_a_write(self):
+        city = make_city()
+        rows = make_weather(city, 3)
+        url = f'/api/weather/?city_id={city.pk}'
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        rows[1].temperature = 35
+        rows[1].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_cities_keep_their_etag(self):
+        city, other = make_city(), make_city('Other')
+        make_weather(city, 2)
+        etag = self.client.get(f'/api/weather/?city_id={city.pk}')['ETag']
+        make_weather(other, 2)
+        self.assertEqual(self.client.get(f'/api/weather/?city_id={city.pk}')['ETag'], etag)
+
+    def test_unfiltered_list_tracks_every_city(self):
+        make_weather(make_city(), 2)
+        etag = self.client.get('/api/weather/')['ETag']
+        make_weather(make_city('Other'), 1)
+        self.assertEqual(self.client.get('/api/weather/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_never_hides_a_new_city(self):
+        make_weather(make_city(), 1)
+        urls = ('/api/cities/', '/api/overview/', '/api/weather/')
+        for url in urls:
+            self.assertNotIn('Last-Modified', self.client.get(url), url)
+
+        make_city('Nagpur')
+        since = http_date(time.time() + 3600)
+        for url in urls:
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200, url)
+
+    def test_city_responses_keep_last_modified(self):
+        city = make_city()
+        make_weather(city, 1)
+        response = self.client.get(f'/api/weather/?city_id={city.pk}')
+        since = response['Last-Modified']
+        self.assertEqual(self.client.get(f'/api/weather/?city_id={city.pk}', HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+    def test_pages_and_formats_have_their_own_etag(self):
+        city = make_city()
+        make_weather(city, 4)
+        url = f'/api/weather/?city_id={city.pk}&page_size=2'
+        first = self.client.get(url)
+        second = self.client.get(first.json()['next'])
+        columnar = self.client.get(url + '&format=columnar')
+        self.assertEqual(len({first['ETag'], second['ETag'], columnar['ETag']}), 3)
+
+    def test_validators_do_not_scan_the_table(self):
+        city = make_city()
+        make_weather(city, 3)
+        etag = self.client.get(f'/api/weather/?city_id={city.pk}')['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/weather/?city_id={city.pk}', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query['sql'] for query in queries if 'weather_data' in query['sql']])
+
+
+class CityVersionTests(ApiTestCase):
+
+    def test_every_bump_counts_and_moves_updated_at(self):
+        city = make_city()
+        first = CityDataVersion.objects.get(city=city)  # created with the city
+        bump_city_versions([city.pk, str(city.pk)])
+        second = CityDataVersion.objects.get(city=city)
+
+        self.assertEqual((first.version, second.version), (1, 2))
+        self.assertGreater(second.updated_at, first.updated_at)
+
+    def test_dashboard_cache_is_dropped_by_a_write(self):
+        city = make_city()
+        row, = make_weather(city, 1, temperature=21)
+        url = f'/api/dashboard/?city_id={city.pk}'
+        self.assertEqual(self.client.get(url).json()['latest_stats']['temperature'], 21)
+
+        row.temperature = 30
+        row.save()
+
+        self.assertEqual(self.client.get(url).json()['latest_stats']['temperature'], 30)
+
+    def test_cached_result_is_reused_until_the_version_moves(self):
+        city = make_city()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'n': len(calls)}
+
+        self.assertEqual(cached_city_result('forecast', city.pk, compute), {'n': 1})
+        self.assertEqual(cached_city_result('forecast', city.pk, compute), {'n': 1})
+        bump_city_versions([city.pk])
+        self.assertEqual(cached_city_result('forecast', city.pk, compute), {'n': 2})
+
+
+class ExportTests(ApiTestCase):
+
+    def test_ndjson_streams_the_whole_history_oldest_first(self):
+        city = make_city()
+        rows = make_weather(city, 5)
+
+        response = self.client.get(f'/api/weather/export/?city_id={city.pk}&format=ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="weather_data.ndjson"')
+        self.assertEqual([line['id'] for line in lines], [row.pk for row in reversed(rows)])
+        self.assertEqual(lines[0]['city_name'], 'Pune')
+
+    def test_csv_has_a_header_and_the_requested_fields(self):
+        make_weather(make_city(), 3)
+
+        response = self.client.get('/api/weather/export/?format=csv&fields=date,temperature')
+        table = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+        self.assertEqual(table[0], ['date', 'temperature'])
+        self.assertEqual(len(table), 4)
+
+    def test_all_city_export_is_ordered_by_date_then_id(self):
+        for name in ('Pune', 'Nagpur'):
+            make_weather(make_city(name), 3)
+
+        response = self.client.get('/api/weather/export/?format=ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        expected = list(WeatherData.objects.order_by('date', 'id').values_list('id', flat=True))
+        self.assertEqual([line['id'] for line in lines], expected)
+
+    @skipUnless(connection.vendor == 'sqlite', "reads SQLite's query plan")
+    def test_export_reads_an_index_in_order(self):
+        city = make_city()
+        oldest_first = WeatherData.objects.order_by('date', 'id')
+        self.assertFalse(sorts_rows(oldest_first))
+        self.assertFalse(sorts_rows(oldest_first.filter(city=city, date__gte=DAY)))
+
+
+class ColumnarFormatTests(ApiTestCase):
+
+    def test_columns_hold_the_same_values_as_rows(self):
+        city = make_city()
+        make_weather(city, 3)
+        url = f'/api/weather/?city_id={city.pk}&page_size=2'
+
+        rows = self.client.get(url).json()
+        columnar = self.client.get(url + '&format=columnar').json()
+
+        self.assertEqual(cursor_of(columnar['next']), cursor_of(rows['next']))
+        self.assertEqual(columnar['columns']['id'], [row['id'] for row in rows['results']])
+        self.assertEqual(columnar['columns']['temperature'], [row['temperature'] for row in rows['results']])
+
+    def test_msgpack_is_negotiated_from_accept(self):
+        if msgpack is None:
+            self.skipTest('msgpack is not installed')
+        make_weather(make_city(), 2)
+
+        response = self.client.get('/api/weather/?fields=date', HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['columns'], {'date': ['2026-01-31', '2026-01-30']})
+
+
+class SparseFieldsAndCompressionTests(ApiTestCase):
+
+    def test_fields_limits_rows_and_rejects_unknown_names(self):
+        make_weather(make_city(), 2)
+
+        body = self.client.get('/api/weather/?fields=date,temperature').json()
+
+        self.assertEqual([set(row) for row in body['results']], [{'date', 'temperature'}] * 2)
+        self.assertEqual(self.client.get('/api/weather/?fields=date,nope').status_code, 400)
+
+    def test_brotli_for_plain_json(self):
+        if middleware.brotli is None:
+            self.skipTest('brotli is not installed')
+        make_weather(make_city(), 20)
+
+        response = self.client.get('/api/weather/', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(middleware.brotli.decompress(response.content))['results'][0]['date'], DAY.isoformat())
+
+    def test_gzip_when_a_csrf_token_is_rendered(self):
+        make_weather(make_city(), 20)
+
+        response = self.client.get('/api/weather/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_gzip_for_session_requests(self):
+        make_weather(make_city(), 20)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'abc'
+
+        response = self.client.get('/api/weather/', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class BulkUpsertTests(ApiTestCase):
+
+    def test_counts_created_updated_and_invalid_rows(self):
+        city = make_city()
+        existing, = make_weather(city, 1)
+        reading = {'city': city.pk, 'humidity': 40, 'rainfall': 0}
+        rows = [
+            {**reading, 'date': str(DAY), 'temperature': 31},  # updates `existing`
+            {**reading, 'date': '2026-02-01', 'temperature': 25},
+            {**reading, 'date': '2026-02-02', 'temperature': 26},
+            {**reading, 'date': '2026-02-03'},  # no temperature
+            {**reading, 'city': 999, 'date': '2026-02-03', 'temperature': 1},
+        ]
+
+        response = self.client.post('/api/weather/', rows, format='json')
+        body = response.json()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((body['created'], body['updated'], body['invalid']), (2, 1, 2))
+        self.assertEqual([result['status'] for result in body['results']], ['updated', 'created', 'created', 'invalid', 'invalid'])
+        self.assertEqual(body['results'][0]['id'], existing.pk)
+        self.assertIn('temperature', body['results'][3]['errors'])
+        existing.refresh_from_db()
+        self.assertEqual(existing.temperature, 31)
+
+    def test_later_duplicate_wins(self):
+        city = make_city()
+        row = {'city': city.pk, 'date': str(DAY), 'humidity': 40, 'rainfall': 0}
+
+        body = self.client.post('/api/weather/', [{**row, 'temperature': 1}, {**row, 'temperature': 2}], format='json').json()
+
+        self.assertEqual(body['results'][0], {'index': 0, 'status': 'duplicate', 'superseded_by': 1})
+        self.assertEqual(WeatherData.objects.get().temperature, 2)
+
+    def test_all_invalid_is_a_bad_request_and_writes_nothing(self):
+        city = make_city()
+        response = self.client.post('/api/weather/', [{'city': city.pk}], format='json')
+        self.assertEqual((response.status_code, response.json()['invalid']), (400, 1))
+        self.assertEqual(CityDataVersion.objects.get(city=city).version, 1)
+
+    def test_write_refreshes_the_dashboard(self):
+        city = make_city()
+        self.client.get(f'/api/dashboard/?city_id={city.pk}')
+        row = {'city': city.pk, 'date': str(DAY), 'temperature': 18, 'humidity': 40, 'rainfall': 0}
+        self.client.post('/api/weather/', [row], format='json')
+        self.assertEqual(self.client.get(f'/api/dashboard/?city_id={city.pk}').json()['latest_stats']['temperature'], 18)
+
+
+class MicroBatcherTests(ApiTestCase):
+
+    def line(self, city, day, **values):
+        return json.dumps({'type': 'traffic', 'city': city, 'date': str(day), 'traffic_density': 3, 'avg_speed': 40, **values})
+
+    def test_flushes_by_size(self):
+        city = make_city()
+        batcher = MicroBatcher(max_rows=2, max_wait=60)
+        for offset in range(5):
+            batcher.add_line(offset + 1, self.line(city.pk, DAY - datetime.timedelta(days=offset)))
+        self.assertEqual((batcher.report['batches'], TrafficData.objects.count()), (2, 4))
+
+        report = batcher.close()
+
+        self.assertEqual((report['batches'], report['created'], TrafficData.objects.count()), (3, 5, 5))
+
+    def test_flushes_an_idle_batch_by_age(self):
+        city = make_city()
+        now = [0.0]
+        batcher = MicroBatcher(max_rows=100, max_wait=1.0, clock=lambda: now[0])
+        batcher.add_line(1, self.line(city.pk, DAY))
+
+        batcher.flush_if_due()
+        self.assertEqual(TrafficData.objects.count(), 0)
+        now[0] = 1.5
+        batcher.flush_if_due()  # what the timer thread does while the stream is stalled
+
+        self.assertEqual((batcher.report['batches'], TrafficData.objects.count()), (1, 1))
+
+    def test_timer_keeps_flushing_after_a_failed_flush(self):
+        batcher = MicroBatcher(max_rows=100, max_wait=0.02)
+        batcher.add_line(1, self.line(1, DAY))
+        attempts = []
+        flushed = threading.Event()
+
+        def write():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('database went away')
+            batcher.buffered = 0
+            flushed.set()
+
+        with mock.patch.object(batcher, '_write', side_effect=write), \
+                self.assertLogs('api.services.ingest', 'ERROR') as logs:
+            batcher.start()
+            try:
+                self.assertTrue(flushed.wait(5))
+            finally:
+                batcher.stop()
+
+        self.assertEqual(len(attempts), 2)
+        self.assertIn('Timed ingest flush failed', logs.output[0])
+
+    def test_timer_thread_stops(self):
+        batcher = MicroBatcher(max_wait=0.01).start()
+        batcher.stop()
+        self.assertIsNone(batcher._timer)
+
+    def test_reports_bad_lines_and_recalculates_risk_per_city(self):
+        city = make_city()
+        make_weather(city, 1)
+        city.air_quality_logs.create(date=DAY, aqi=150, pm25=40, pm10=60, no2=10)
+        batcher = MicroBatcher(max_rows=100, max_wait=60)
+        batcher.add_line(1, self.line(str(city.pk), DAY))  # city as a string
+        batcher.add_line(2, '{not json')
+        batcher.add_line(3, json.dumps({'type': 'rain'}))
+        batcher.add_line(4, self.line(999, DAY))
+
+        report = batcher.close()
+
+        self.assertEqual((report['lines'], report['created'], report['invalid']), (4, 1, 3))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3, 4])
+        self.assertTrue(HealthIndex.objects.filter(city=city).exists())
+
+    def test_ingest_endpoint(self):
+        city = make_city()
+        body = '\n'.join(self.line(city.pk, DAY - datetime.timedelta(days=offset)) for offset in range(3))
+
+        response = self.client.generic('POST', '/api/ingest/', body, content_type='application/x-ndjson')
+
+        self.assertEqual((response.status_code, response.json()['created']), (200, 3))
+
+
+@mock.patch.object(WatermarkPagination, 'settle_seconds', 0)
+class DeltaSyncTests(ApiTestCase):
+
+    def sync(self, since):
+        """All changes after `since`, following "next"; returns (ids, watermark)."""
+        url, ids = f'/api/weather/?since={since}&page_size=2', []
+        while url:
+            body = self.client.get(url).json()
+            ids += [row['id'] for row in body['results']]
+            url, watermark = body['next'], body['watermark']
+        return ids, watermark
+
+    def test_changes_after_the_watermark_only(self):
+        rows = make_weather(make_city(), 3)
+        ids, watermark = self.sync('0')
+        self.assertEqual(sorted(ids), sorted(row.pk for row in rows))
+
+        self.assertEqual(self.sync(watermark), ([], watermark))
+
+        rows[2].temperature = 40
+        rows[2].save()
+        ids, newer = self.sync(watermark)
+        self.assertEqual(ids, [rows[2].pk])
+        self.assertNotEqual(newer, watermark)
+
+    def test_unsettled_rows_are_held_back(self):
+        make_weather(make_city(), 2)
+        with mock.patch.object(WatermarkPagination, 'settle_seconds', 60):
+            self.assertEqual(self.sync('0'), ([], '0'))
+
+    def test_invalid_watermark_is_not_found(self):
+        self.assertEqual(self.client.get('/api/weather/?since=garbage').status_code, 404)
+
+
+class BatchTests(ApiTestCase):
+
+    def test_runs_reads_in_order(self):
+        city = make_city()
+        make_weather(city, 2)
+
+        body = self.client.post('/api/batch/', {'requests': [
+            {'path': '/api/dashboard/', 'params': {'city_id': city.pk}},
+            {'path': f'/api/weather/?city_id={city.pk}', 'params': {'page_size': 1}},
+            {'path': '/api/nowhere/'},
+            {'method': 'DELETE', 'path': '/api/cities/'},
+        ]}, format='json').json()['responses']
+
+        self.assertEqual([response['status'] for response in body], [200, 200, 404, 405])
+        self.assertEqual(body[0]['body']['city'], 'Pune')
+        self.assertEqual(len(body[1]['body']['results']), 1)
+
+    def test_writes_are_refused(self):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'method': 'POST', 'path': '/api/cities/', 'body': {'city_name': 'X'}},
+        ]}, format='json')
+        self.assertEqual(response.json()['responses'][0]['status'], 405)
+        self.assertFalse(City.objects.exists())
+
+    def test_request_count_is_bounded(self):
+        self.assertEqual(self.client.post('/api/batch/', {'requests': []}, format='json').status_code, 400)
+        requests = [{'path': '/api/cities/'}] * (BatchView.max_requests + 1)
+        self.assertEqual(self.client.post('/api/batch/', {'requests': requests}, format='json').status_code, 400)
+
+
+@override_settings(CITY_EVENTS_POLL=0)  # no watcher thread on the test database
+class CityEventTests(ApiTestCase):
+
+    def test_stream_sends_the_newest_event_of_the_wanted_cities(self):
+        async def scenario():
+            stream = CityEventsView().stream({1})
+            self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+            pending = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)  # the stream is now subscribed and waiting
+            for city_id, stamp in ((1, 'old'), (2, 'other'), (1, 'new')):
+                city_events.publish(city_id, updated_at=stamp)
+            frame = await pending
+            await stream.aclose()
+            return frame
+
+        frame = asyncio.run(scenario())
+
+        self.assertIn('event: city-update\n', frame)
+        self.assertEqual(json.loads(frame.split('data: ')[1])['updated_at'], 'new')
+        self.assertEqual(len(city_events), 0)
+
+    def test_slow_subscriber_keeps_the_latest_events(self):
+        async def scenario():
+            loop, queue = subscription = city_events.subscribe()
+            for n in range(CityEventBroker.max_queued + 5):
+                CityEventBroker._offer(queue, {'n': n})
+            city_events.unsubscribe(subscription)
+            return queue.get_nowait()['n'], queue.qsize()
+
+        self.assertEqual(asyncio.run(scenario()), (5, CityEventBroker.max_queued - 1))
+
+    def test_committed_writes_are_announced(self):
+        city = make_city()
+        with mock.patch.object(city_events, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                make_weather(city, 1)
+        publish.assert_called_once_with(city.pk, updated_at=mock.ANY)
+
+    def test_wsgi_requests_are_refused(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 503)
+
+    def test_a_bump_is_published_once(self):
+        broker, stamp = CityEventBroker(), datetime.datetime(2026, 1, 31, tzinfo=datetime.timezone.utc)
+        with mock.patch.object(broker, 'publish') as publish:
+            broker.changed(1, stamp)
+            broker.changed(1, stamp)
+            broker.changed(1, stamp - datetime.timedelta(seconds=1))
+        publish.assert_called_once_with(1, updated_at=stamp.isoformat())
+
+    def test_poll_publishes_bumps_of_other_processes(self):
+        city, broker = make_city(), CityEventBroker()
+        broker.poll()
+        stamp = CityDataVersion.objects.get(city=city).updated_at + datetime.timedelta(seconds=1)
+        CityDataVersion.objects.filter(city=city).update(version=2, updated_at=stamp)  # as the ETL loader does
+
+        with mock.patch.object(broker, 'publish') as publish:
+            broker.poll()
+            broker.poll()  # the overlap window sees the bump again
+
+        publish.assert_called_once_with(city.pk, updated_at=stamp.isoformat())
+
+
+class SingleFlightTests(ApiTestCase):
+
+    def test_concurrent_calls_run_once(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        threads = [threading.Thread(target=lambda: results.append(flights.do('key', compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while len(flights) == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)  # let the followers reach the wait
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('value', False)] + [('value', True)] * 4)
+        self.assertEqual(len(flights), 0)
+
+    def test_leader_error_reaches_followers_and_is_not_remembered(self):
+        flights = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flights.do('key', lambda: 1 / 0)
+        self.assertEqual(flights.do('key', lambda: 2), (2, False))
+
+    def test_async_callers_share_one_task(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def scenario():
+            flights = AsyncSingleFlight()
+            return await asyncio.gather(*(flights.do('key', compute) for _ in range(3)))
+
+        self.assertEqual(asyncio.run(scenario()), [('value', False), ('value', True), ('value', True)])
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(CITY_SINGLE_FLIGHT_TIMEOUT=30, CITY_SINGLE_FLIGHT_POLL=0.01)
+    def test_cache_lock_of_a_crashed_holder_is_waited_out_until_it_expires(self):
+        cache.add('key:lock', ('crashed', time.time() + 0.2), timeout=30)
+        started = time.monotonic()
+
+        self.assertEqual(_cache_locked('key', lambda: 'computed'), ('computed', False))
+        self.assertLess(time.monotonic() - started, 2)
+
+    @override_settings(CITY_SINGLE_FLIGHT_POLL=0.01)
+    def test_cache_lock_is_released_on_failure_and_results_are_shared(self):
+        with self.assertRaises(ZeroDivisionError):
+            _cache_locked('key', lambda: 1 / 0)
+        self.assertIsNone(cache.get('key:lock'))
+
+        cache.add('key:lock', ('other', time.time() + 30), timeout=30)
+        cache.set('key', 'stored')
+        self.assertEqual(_cache_locked('key', lambda: 'computed'), ('stored', True))
+
+
+class AdmissionGateTests(TestCase):
+
+    def test_a_full_queue_is_rejected_without_waiting(self):
+        gate = AdmissionGate('test', limit=1, queue_size=0, max_wait=5)
+        with gate.admit():
+            started = time.monotonic()
+            with self.assertRaises(ServiceOverloaded) as raised:
+                with gate.admit():
+                    pass
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(raised.exception.wait, 5)
+        self.assertEqual(gate.stats()['rejected'], 1)
+
+    def test_a_queued_call_gives_up_after_max_wait(self):
+        gate = AdmissionGate('test', limit=1, queue_size=1, max_wait=0.05)
+        with gate.admit():
+            with self.assertRaises(ServiceOverloaded) as raised:
+                with gate.admit():
+                    pass
+        self.assertEqual(raised.exception.wait, 1)
+        self.assertEqual(gate.stats()['queued'], 0)
+
+    def test_a_queued_call_runs_once_a_slot_frees(self):
+        gate = AdmissionGate('test', limit=1, queue_size=1, max_wait=5)
+        ran = []
+
+        def call():
+            with gate.admit():
+                ran.append(1)
+
+        with gate.admit():
+            waiter = threading.Thread(target=call)
+            waiter.start()
+            while gate.stats()['queued'] == 0:
+                time.sleep(0.01)
+        waiter.join(5)
+        self.assertEqual(ran, [1])
+        self.assertEqual(gate.stats()['admitted'], 2)
+
+
+class StaticSnapshotTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        self.enterContext(override_settings(STATIC_SNAPSHOT_ROOT=root.name))
+
+    def test_an_older_stamp_never_replaces_a_newer_file(self):
+        path = self.root / 'doc.json'
+        newer = datetime.datetime(2026, 2, 1, 12, 0, 0, 500, tzinfo=datetime.timezone.utc)
+        older = newer - datetime.timedelta(seconds=1)
+
+        self.assertTrue(static_snapshots.write_atomic(path, b'new', newer))
+        self.assertFalse(static_snapshots.write_atomic(path, b'old', older))
+        self.assertEqual(path.read_bytes(), b'new')
+        self.assertEqual(path.stat().st_mtime_ns, static_snapshots._stamp_ns(newer))
+
+        self.assertTrue(static_snapshots.write_atomic(path, b'old', older, replace_newer=True))
+        self.assertEqual(path.read_bytes(), b'old')
+
+    def test_files_are_stamped_with_the_data_version(self):
+        city = make_city()
+        make_weather(city, 2)
+        static_snapshots.publish([city.pk])
+
+        updated_at = CityDataVersion.objects.get(city=city).updated_at
+        for name in ('cities.json', 'overview.json', f'dashboard/{city.pk}.json', 'overview.json.gz'):
+            self.assertEqual((self.root / name).stat().st_mtime_ns, static_snapshots._stamp_ns(updated_at), name)
+
+    def test_a_partial_publish_keeps_newer_files_but_a_full_one_replaces_them(self):
+        city = make_city()
+        make_weather(city, 1)
+        static_snapshots.publish([city.pk])
+        overview = self.root / 'overview.json'
+        future = time.time_ns() + 3600 * 10**9
+        os.utime(overview, ns=(future, future))
+
+        make_weather(make_city('Nagpur'), 1)
+        static_snapshots.publish([city.pk])
+        self.assertNotIn(b'Nagpur', overview.read_bytes())
+
+        static_snapshots.publish()
+        self.assertIn(b'Nagpur', overview.read_bytes())
+
+    def test_a_burst_of_writes_is_published_once_in_the_background(self):
+        calls = []
+        published = threading.Event()
+
+        def publish(city_ids):
+            calls.append(city_ids)
+            published.set()
+
+        with override_settings(STATIC_SNAPSHOT_DELAY=0.1), \
+                mock.patch.object(static_snapshots, 'publish', side_effect=publish):
+            static_snapshots.cities_changed([1])
+            static_snapshots.cities_changed([2, 3])
+            self.assertEqual(calls, [])  # the writers returned without publishing
+            self.assertTrue(published.wait(5))
+
+        self.assertEqual(calls, [{1, 2, 3}])
+
+    @override_settings(STATIC_SNAPSHOT_DELAY=0)
+    def test_without_a_delay_the_writer_publishes(self):
+        with mock.patch.object(static_snapshots, 'publish', return_value=1) as publish:
+            static_snapshots.cities_changed([5])
+        publish.assert_called_once_with({5})
+
+    @override_settings(STATIC_SNAPSHOT_DELAY=30)
+    def test_flush_publishes_what_is_queued(self):
+        with mock.patch.object(static_snapshots, 'publish', return_value=2) as publish:
+            static_snapshots.cities_changed([4])
+            self.assertEqual(static_snapshots.flush(), 2)
+            self.assertEqual(static_snapshots.flush(), 0)
+        publish.assert_called_once_with({4})
+
+
+class PointInTimeTests(ApiTestCase):
+
+    def dashboard(self, city, **params):
+        return self.client.get('/api/dashboard/', {'city_id': city.pk, **params})
+
+    def test_as_of_reads_the_rows_dated_on_or_before_it(self):
+        city = make_city()
+        make_weather(city, 5)
+
+        self.assertEqual(self.dashboard(city).json()['latest_stats']['temperature'], 20)
+        past = self.dashboard(city, as_of=str(DAY - datetime.timedelta(days=2))).json()
+        self.assertEqual(past['latest_stats']['temperature'], 22)
+        before = self.dashboard(city, as_of=str(DAY - datetime.timedelta(days=10))).json()
+        self.assertIsNone(before['latest_stats']['temperature'])
+
+    def test_malformed_as_of_is_a_400(self):
+        response = self.dashboard(make_city(), as_of='31/01/2026')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'as_of': 'Expected a date in YYYY-MM-DD format.'})
+
+    def test_replay_matches_one_date_at_a_time(self):
+        city = make_city()
+        make_weather(city, 5)
+        dates = [DAY - datetime.timedelta(days=offset) for offset in (6, 3, 1, 0)]
+
+        for as_of, snapshot in snapshots_as_of(city, dates):
+            single = snapshot_as_of(city, as_of)
+            self.assertEqual((snapshot.weather_date, snapshot.temperature), (single.weather_date, single.temperature))
+
+
+class ServerTimingTests(ApiTestCase):
+
+    def test_api_responses_carry_the_timing_breakdown(self):
+        make_weather(make_city(), 2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/weather/')
+
+        metrics = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'db', 'serialize', 'view', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', metrics['db'])
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_requests_over_the_query_budget_are_logged_as_warnings(self):
+        make_weather(make_city(), 2)
+        with self.assertLogs('api.timing', 'WARNING') as logs:
+            self.client.get('/api/weather/')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/api/weather/')
+        self.assertTrue(record['over_query_budget'])
+        self.assertGreater(record['queries'], 1)
+
+
+class ProfilingTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        self.enterContext(override_settings(PROFILE_TOKEN='secret', PROFILE_ROOT=root.name, PROFILE_SAMPLE_RATE=0))
+
+    def test_token_holders_get_a_stored_profile(self):
+        response = self.client.get('/api/cities/', HTTP_X_PROFILE='secret')
+        name = response['X-Profile-Id']
+        self.assertTrue(name.endswith('.pstats'))
+
+        listed = self.client.get('/api/profiles/', HTTP_X_PROFILE='secret').json()['profiles']
+        self.assertEqual([(profile['name'], profile['mode']) for profile in listed], [(name, 'cprofile')])
+        download = self.client.get(f'/api/profiles/{name}/', HTTP_X_PROFILE='secret')
+        self.assertEqual(b''.join(download.streaming_content), (self.root / name).read_bytes())
+
+    def test_sample_mode_stores_folded_stacks(self):
+        response = self.client.get('/api/cities/', HTTP_X_PROFILE='secret', HTTP_X_PROFILE_MODE='sample')
+        self.assertTrue(response['X-Profile-Id'].endswith('.folded'))
+
+    def test_a_wrong_token_is_neither_profiled_nor_let_in(self):
+        response = self.client.get('/api/cities/', HTTP_X_PROFILE='guess')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list(self.root.iterdir()), [])
+        self.assertEqual(self.client.get('/api/profiles/', HTTP_X_PROFILE='guess').status_code, 403)
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_only_the_newest_profiles_are_kept(self):
+        names = [self.client.get('/api/cities/', HTTP_X_PROFILE='secret')['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()), names[1:])
+
+
+class DashboardSnapshotTests(ApiTestCase):
+
+    def dashboard(self, city_id):
+        return self.client.get('/api/dashboard/', {'city_id': city_id})
+
+    def test_orm_writes_keep_the_snapshot_current(self):
+        city = make_city()
+        newest, previous = make_weather(city, 2)
+        snapshot = CitySnapshot.objects.get(city=city)
+        self.assertEqual((snapshot.weather_date, snapshot.temperature), (DAY, 20))
+
+        newest.delete()
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.weather_date, snapshot.temperature), (previous.date, 21))
+        self.assertEqual(self.dashboard(city.pk).json()['latest_stats']['temperature'], 21)
+
+    def test_writes_behind_the_orm_rebuild_the_snapshot_on_read(self):
+        city = make_city()
+        make_weather(city, 1)
+        self.assertEqual(self.dashboard(city.pk).json()['latest_stats']['temperature'], 20)
+
+        # Like an ETL load: no signals, only the version bump
+        WeatherData.objects.bulk_create([
+            WeatherData(city=city, date=DAY + datetime.timedelta(days=1), temperature=30, humidity=50, rainfall=0)
+        ])
+        bump_city_versions([city.pk])
+
+        self.assertEqual(self.dashboard(city.pk).json()['latest_stats']['temperature'], 30)
+        self.assertEqual(CitySnapshot.objects.get(city=city).temperature, 30)
+
+    def test_unknown_city_is_a_404(self):
+        self.assertEqual(self.dashboard(999).status_code, 404)
+
+
+class DashboardHistoryTests(ApiTestCase):
+
+    def history(self, city, days):
+        return self.client.get('/api/dashboard/', {'city_id': city.pk, 'history': days})
+
+    def test_history_covers_the_days_up_to_the_latest_row_oldest_first(self):
+        city = make_city()
+        make_weather(city, 5)
+
+        history = self.history(city, 3).json()['history']
+
+        self.assertEqual(history['days'], 3)
+        self.assertEqual(history['weather']['date'], [str(DAY - datetime.timedelta(days=offset)) for offset in (2, 1, 0)])
+        self.assertEqual(history['weather']['temperature'], [22, 21, 20])
+        self.assertEqual(history['air_quality'], {'date': [], 'aqi': [], 'pm25': []})
+
+    def test_out_of_range_history_is_a_400(self):
+        city = make_city()
+        for days in ('0', '366', 'week'):
+            self.assertEqual(self.history(city, days).status_code, 400, days)
@@ -1,9 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncCityDashboardView
 from .views import (
     CityViewSet, WeatherViewSet, AirQualityViewSet, 
     TrafficViewSet, AgricultureViewSet, HealthIndexViewSet,
-    CityDashboardView, SyncWeatherView
+    BatchView, CityDashboardView, CityEventsView, CityOverviewView, IngestView, MetricsView,
+    ProfileDownloadView, ProfileListView, SyncWeatherView
 )
 
 router = DefaultRouter()
@@ -20,5 +22,13 @@ urlpatterns = [
     
     # Custom Analytics URLs
     path('dashboard/', CityDashboardView.as_view(), name='city-dashboard'),
+    path('async/dashboard/', AsyncCityDashboardView.as_view(), name='async-city-dashboard'),
+    path('overview/', CityOverviewView.as_view(), name='city-overview'),
+    path('events/', CityEventsView.as_view(), name='city-events'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('ingest/', IngestView.as_view(), name='ingest'),
     path('sync/weather/', SyncWeatherView.as_view(), name='sync-weather'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('profiles/', ProfileListView.as_view(), name='profiles'),
+    path('profiles/<str:name>/', ProfileDownloadView.as_view(), name='profile-download'),
 ]
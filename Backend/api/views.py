@@ -1,77 +1,267 @@
+import asyncio
+import json
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.permissions import BasePermission
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date
 from django.db.models import Avg, Max, Min
 
-from .models import City, WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from .conditional import conditional_response, make_etag, city_data_validators, city_validators
+from .models import City, CitySnapshot, WeatherData, AirQuality, TrafficData, AgricultureData, HealthIndex
+from .pagination import DateKeysetPagination, WatermarkPagination
+from .renderers import (
+    COLUMNAR_FORMATS, COLUMNAR_RENDERERS, CSVRenderer, NDJSONRenderer, csv_lines, ndjson_lines
+)
+from .services.admission import admission_stats
+from .services.batch import run_subrequest
+from .services.bulk_upsert import bulk_upsert
+from .services.downsample import downsample_dates
+from .services.events import city_events
+from .services.history import MAX_HISTORY_DAYS, dashboard_history, history_days
+from .services.ingest import MicroBatcher, writer_slots
+from .services.memo import request_memo
+from .services.overview import city_overview
+from .services.profiling import list_profiles, may_read_profiles, profile_path
+from .services.snapshot import dashboard_payload, refresh_snapshot, snapshot_as_of
+from .services.timing import timed
+from .services.versioning import cache_stats, cached_city_result, city_version
 from .serializers import (
     CitySerializer, WeatherDataSerializer, AirQualitySerializer, 
-    TrafficDataSerializer, AgricultureDataSerializer, HealthIndexSerializer
+    TrafficDataSerializer, AgricultureDataSerializer, HealthIndexSerializer, to_columns
 )
 
 # --- Standard CRUD APIs ---
 
 class CityViewSet(viewsets.ModelViewSet):
-    queryset = City.objects.all()
+    queryset = City.objects.with_current_risk()
     serializer_class = CitySerializer
 
-class WeatherViewSet(viewsets.ModelViewSet):
-    queryset = WeatherData.objects.all().order_by('-date')
-    serializer_class = WeatherDataSerializer
-    filterset_fields = ['city', 'date'] # Requires django-filter, sticking to basic for now
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = city_validators(City.objects.all())
+        return conditional_response(
+            request, etag, last_modified,
+            lambda: super(CityViewSet, self).list(request, *args, **kwargs)
+        )
+
+def parse_date_param(request, name):
+    # request.GET rather than query_params: also used by the plain async views
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Expected a date in YYYY-MM-DD format."})
+    return parsed
+
+class TimeSeriesViewSet(viewsets.ModelViewSet):
+    """
+    Shared behaviour for the per-city time-series tables.
+    Lists are serialized from flat rows joined to City in a single query and
+    paginated by (date, id) keyset, so cost stays flat as history grows.
+
+    Chart helpers: ?start=YYYY-MM-DD&end=YYYY-MM-DD bound the range (inclusive),
+    and ?points=N (with city_id) returns an LTTB-downsampled series of N rows
+    chosen on `metric` (default: the view's downsample_metric).
+
+    ?format=columnar (or msgpack) answers with column arrays built straight
+    from the value tuples instead of one object per row.
+
+    ?fields=date,aqi limits every GET (lists, points, export, detail) to those
+    fields, and lists/exports only SELECT the matching columns.
+
+    ?since=<watermark> (start with 0) switches to delta sync: rows inserted or
+    updated after the watermark, oldest change first, plus the new watermark.
+
+    POSTing a JSON array upserts the whole batch on (city, date) and reports
+    an outcome per row; a single object still creates one row.
+    """
+    pagination_class = DateKeysetPagination
+    delta_pagination_class = WatermarkPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *COLUMNAR_RENDERERS]
+    downsample_metric = None
+    max_points = 5000
+    export_chunk_size = 2000
+    fields_query_param = 'fields'
+    max_bulk_rows = 5000
+
+    def requested_fields(self):
+        """Names from ?fields=a,b, or None when every field is wanted."""
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            delta = self.delta_pagination_class.cursor_query_param in self.request.query_params
+            self._paginator = (self.delta_pagination_class if delta else self.pagination_class)()
+        return self._paginator
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        """Allow filtering by city_id via query param"""
-        queryset = super().get_queryset()
+        """Allow filtering by city_id and date range via query params"""
+        queryset = super().get_queryset().select_related('city')
         city_id = self.request.query_params.get('city_id')
         if city_id:
             queryset = queryset.filter(city_id=city_id)
+
+        start = parse_date_param(self.request, 'start')
+        end = parse_date_param(self.request, 'end')
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
         return queryset
 
-class AirQualityViewSet(viewsets.ModelViewSet):
-    queryset = AirQuality.objects.all().order_by('-date')
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if isinstance(self.paginator, WatermarkPagination):
+            # Already incremental, and rows leave the settle window without any write
+            return self.list_response(queryset)
+        # Row and columnar representations share the URL, so the format is part of the ETag;
+        # the query string carries the page bounds (cursor, page_size, start/end, fields...)
+        etag, last_modified = city_data_validators(
+            request.query_params.get('city_id'), queryset.model._meta.db_table,
+            request.accepted_renderer.format, sorted(request.query_params.lists())
+        )
+        response = conditional_response(request, etag, last_modified, lambda: self.list_response(queryset))
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        if not 1 <= len(request.data) <= self.max_bulk_rows:
+            raise ValidationError({"non_field_errors": [f"Expected between 1 and {self.max_bulk_rows} rows."]})
+
+        report = bulk_upsert(self.get_serializer_class(), request.data)
+        written = report['created'] + report['updated']
+        return Response(report, status=201 if written else 400)
+
+    def list_response(self, queryset):
+        if 'points' in self.request.query_params:
+            return self.downsampled_response(queryset)
+
+        page = self.paginate_queryset(queryset)
+        fields = self.requested_fields()
+        hidden = []
+        if fields is not None:
+            # The next cursor is built from the last row's (date, id)
+            hidden = [name for name in self.paginator.cursor_fields if name not in fields]
+            fields = [*fields, *hidden]
+        serializer = self.get_serializer(fields=fields)
+        if self.request.accepted_renderer.format in COLUMNAR_FORMATS:
+            names = [name for name, _, _ in serializer.flat_fields()]
+            with timed('serialize'):
+                rows = list(serializer.iter_values(page))
+            return self.paginator.get_columnar_response(names, rows, hidden)
+        return self.paginator.get_paginated_response(serializer.serialize_queryset(page), hidden)
+
+    def downsampled_response(self, queryset):
+        params = self.request.query_params
+        if not params.get('city_id'):
+            raise ValidationError({"points": "Downsampling requires city_id."})
+        try:
+            points = int(params['points'])
+        except ValueError:
+            points = 0
+        if not 3 <= points <= self.max_points:
+            raise ValidationError({"points": f"Expected an integer between 3 and {self.max_points}."})
+
+        metric = params.get('metric', self.downsample_metric)
+        numeric_fields = {
+            f.name for f in queryset.model._meta.concrete_fields
+            if f.get_internal_type() in ('FloatField', 'SmallIntegerField', 'IntegerField')
+        }
+        if metric not in numeric_fields:
+            raise ValidationError({"metric": f"Expected one of: {', '.join(sorted(numeric_fields))}."})
+
+        # Pass 1: only (id, date, metric) for the whole range, oldest first
+        series = list(queryset.order_by('date', 'id').values_list('id', 'date', metric))
+        if series:
+            ids, dates, values = zip(*series)
+            keep = downsample_dates(dates, values, points)
+            selected = [ids[i] for i in keep]
+        else:
+            selected = []
+
+        # Pass 2: full rows for the selected points only
+        serializer = self.get_serializer()
+        queryset = queryset.filter(id__in=selected)
+        if self.request.accepted_renderer.format in COLUMNAR_FORMATS:
+            names = [name for name, _, _ in serializer.flat_fields()]
+            with timed('serialize'):
+                columns = to_columns(list(serializer.iter_values(queryset)), names)
+            return Response({"next": None, "source_points": len(series), "columns": columns})
+        rows = serializer.serialize_queryset(queryset)
+        return Response({"next": None, "source_points": len(series), "results": rows})
+
+    @action(detail=False, renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream the whole (filtered) history, oldest first, as NDJSON or CSV:
+        /api/air-quality/export/?format=csv (or an Accept header). Rows come
+        through a server-side cursor, so memory stays flat at any table size.
+        The (date, id) and (city, date, id) indexes serve this order as is, so
+        the first rows go out before the table has been read.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by('date', 'id')
+        serializer = self.get_serializer()
+        names = [name for name, _, _ in serializer.flat_fields()]
+        rows = serializer.iter_values(queryset, chunk_size=self.export_chunk_size)
+
+        renderer = request.accepted_renderer
+        lines = csv_lines if renderer.format == 'csv' else ndjson_lines
+        response = StreamingHttpResponse(
+            lines(names, rows), content_type=f"{renderer.media_type}; charset=utf-8"
+        )
+        filename = f"{queryset.model._meta.db_table}.{renderer.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class WeatherViewSet(TimeSeriesViewSet):
+    queryset = WeatherData.objects.all().order_by('-date', '-id')
+    serializer_class = WeatherDataSerializer
+    downsample_metric = 'temperature'
+    filterset_fields = ['city', 'date'] # Requires django-filter, sticking to basic for now
+
+class AirQualityViewSet(TimeSeriesViewSet):
+    queryset = AirQuality.objects.all().order_by('-date', '-id')
     serializer_class = AirQualitySerializer
-    
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        city_id = self.request.query_params.get('city_id')
-        if city_id:
-            queryset = queryset.filter(city_id=city_id)
-        return queryset
+    downsample_metric = 'aqi'
 
-class TrafficViewSet(viewsets.ModelViewSet):
-    queryset = TrafficData.objects.all().order_by('-date')
+class TrafficViewSet(TimeSeriesViewSet):
+    queryset = TrafficData.objects.all().order_by('-date', '-id')
     serializer_class = TrafficDataSerializer
+    downsample_metric = 'traffic_density'
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        city_id = self.request.query_params.get('city_id')
-        if city_id:
-            queryset = queryset.filter(city_id=city_id)
-        return queryset
-
-class AgricultureViewSet(viewsets.ModelViewSet):
-    queryset = AgricultureData.objects.all().order_by('-date')
+class AgricultureViewSet(TimeSeriesViewSet):
+    queryset = AgricultureData.objects.all().order_by('-date', '-id')
     serializer_class = AgricultureDataSerializer
+    downsample_metric = 'yield_amount'
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        city_id = self.request.query_params.get('city_id')
-        if city_id:
-            queryset = queryset.filter(city_id=city_id)
-        return queryset
-
-class HealthIndexViewSet(viewsets.ModelViewSet):
-    queryset = HealthIndex.objects.all().order_by('-date')
+class HealthIndexViewSet(TimeSeriesViewSet):
+    queryset = HealthIndex.objects.all().order_by('-date', '-id')
     serializer_class = HealthIndexSerializer
-
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        city_id = self.request.query_params.get('city_id')
-        if city_id:
-            queryset = queryset.filter(city_id=city_id)
-        return queryset
+    downsample_metric = 'health_risk_score'
 
 
 # --- Analytics / Dashboard APIs (The 'Brain') ---
@@ -80,41 +270,208 @@ class CityDashboardView(APIView):
     """
     Returns a snapshot of the latest data for a specific city.
     Usage: /api/dashboard/?city_id=1
+    Add &history=N (days, max 365) for sparkline arrays of every metric, and
+    &as_of=YYYY-MM-DD for the dashboard as it stood on that date.
+    Built from the CitySnapshot read model and cached per city data version;
+    the version row also provides the ETag / Last-Modified validators.
     """
     def get(self, request):
         city_id = request.query_params.get('city_id')
         if not city_id:
             return Response({"error": "city_id parameter is required"}, status=400)
-        
-        city = get_object_or_404(City, pk=city_id)
-        
-        # Helper to get latest record
-        def get_latest(model):
-            return model.objects.filter(city=city).order_by('-date').first()
-
-        weather = get_latest(WeatherData)
-        aqi = get_latest(AirQuality)
-        traffic = get_latest(TrafficData)
-        health = get_latest(HealthIndex)
-        agro = AgricultureData.objects.filter(city=city).order_by('-date')[:5] # Last 5 Agro records
-
-        data = {
-            "city": city.city_name,
-            "state": city.state,
-            "latest_stats": {
-                "temperature": round(weather.temperature, 2) if weather and weather.temperature else None,
-                "humidity": round(weather.humidity, 2) if weather and weather.humidity else None,
-                "rainfall": round(weather.rainfall, 2) if weather and weather.rainfall else 0,
-                "aqi": aqi.aqi if aqi else None,
-                "pm25": round(aqi.pm25, 2) if aqi and aqi.pm25 else None,
-                "traffic_density": traffic.traffic_density if traffic else None,
-                "health_risk": round(health.health_risk_score, 2) if health and health.health_risk_score else None,
-                "risk_level": health.risk_level if health else None,
-                "weather_updated_at": weather.ingested_at if weather else None,
-            },
-            "recent_crops": AgricultureDataSerializer(agro, many=True).data
-        }
-        return Response(data)
+
+        try:
+            days = history_days(request.query_params.get('history'))
+        except ValueError:
+            return Response({"error": f"history must be between 1 and {MAX_HISTORY_DAYS} days"}, status=400)
+        as_of = parse_date_param(request, 'as_of')
+
+        version, data_updated_at = city_version(city_id)
+        etag = make_etag('dashboard', city_id, version, as_of)
+        return conditional_response(
+            request, etag, data_updated_at,
+            lambda: Response(cached_city_result(
+                'dashboard', city_id,
+                lambda: self.build_payload(city_id, days, data_updated_at, as_of),
+                days, as_of, version=version
+            ))
+        )
+
+    def build_payload(self, city_id, days, data_updated_at, as_of=None):
+        if as_of:
+            # Point in time: the rows on or before as_of, never stored as the snapshot
+            snapshot = snapshot_as_of(get_object_or_404(City, pk=city_id), as_of)
+        else:
+            snapshot = self.current_snapshot(city_id, data_updated_at)
+
+        data = dashboard_payload(snapshot)
+        if days:
+            data["history"] = dashboard_history(snapshot, days)
+        return data
+
+    def current_snapshot(self, city_id, data_updated_at):
+        snapshot = CitySnapshot.objects.select_related('city').filter(city_id=city_id).first()
+        if snapshot is None or (data_updated_at and snapshot.updated_at < data_updated_at):
+            # First read, or data written behind the ORM (ETL): rebuild from history
+            city = get_object_or_404(City, pk=city_id)
+            snapshot = refresh_snapshot(city.pk)
+        return snapshot
+
+class CityOverviewView(APIView):
+    """
+    Latest status of every city in one call (for the cities page).
+    Usage: /api/overview/
+    """
+    def get(self, request):
+        etag, last_modified = city_validators(City.objects.all())
+        return conditional_response(request, etag, last_modified, lambda: Response(city_overview()))
+
+class CityEventsView(View):
+    """
+    Server-Sent Events stream of city data changes, so open dashboards refetch
+    when something was written instead of polling. Served by the ASGI app
+    (myproject/asgi.py); each open stream costs an idle coroutine. Writes of
+    other processes arrive up to CITY_EVENTS_POLL seconds later (see
+    CityEventBroker).
+    Usage: new EventSource('/api/events/?city_id=1')  (omit city_id for every city)
+        event: city-update
+        data: {"id": 12, "city_id": 1, "updated_at": "2024-01-01T10:00:00+00:00"}
+    """
+    heartbeat_seconds = 15
+    retry_ms = 5000
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"error": "Event streams are only served by the ASGI application"}, status=503)
+        city_ids = set()
+        for value in filter(None, request.GET.get('city_id', '').split(',')):
+            if not value.isdigit():
+                return JsonResponse({"error": "city_id must be a comma-separated list of ids"}, status=400)
+            city_ids.add(int(value))
+
+        response = StreamingHttpResponse(self.stream(city_ids), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, city_ids):
+        subscription = city_events.subscribe()
+        queue = subscription[1]
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while True:
+                try:
+                    events = [await asyncio.wait_for(queue.get(), self.heartbeat_seconds)]
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                while not queue.empty():
+                    events.append(queue.get_nowait())
+
+                # Only the newest event per city matters to a client that refetches
+                latest = {}
+                for event in events:
+                    if not city_ids or int(event['city_id']) in city_ids:
+                        latest[event['city_id']] = event
+                for event in latest.values():
+                    yield f"id: {event['id']}\nevent: city-update\ndata: {json.dumps(event)}\n\n"
+        finally:
+            city_events.unsubscribe(subscription)
+
+class BatchView(APIView):
+    """
+    Runs several API reads in one round trip and returns their results in order.
+    Usage: POST /api/batch/
+    {"requests": [{"path": "/api/dashboard/", "params": {"city_id": 1}},
+                  {"path": "/api/analytics/forecast/1/"},
+                  {"method": "POST", "path": "/api/analytics/simulate/1/", "body": {}}]}
+    Sub-requests share the per-city lookups (data version, latest rows).
+    """
+    max_requests = 20
+
+    def post(self, request):
+        specs = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(specs, list) or not 1 <= len(specs) <= self.max_requests:
+            return Response({"error": f"requests must be a list of 1 to {self.max_requests} items"}, status=400)
+
+        with request_memo():
+            responses = [run_subrequest(request._request, spec) for spec in specs]
+        return Response({"responses": responses})
+
+class MetricsView(APIView):
+    """
+    Runtime counters (per-namespace cache hits/misses, open event streams,
+    admission queues of this process).
+    Usage: /api/metrics/
+    """
+    def get(self, request):
+        return Response({
+            "cache": cache_stats(),
+            "event_streams": len(city_events),
+            "admission": admission_stats(),
+        })
+
+class ProfileAccess(BasePermission):
+    """Profiles are readable with the X-Profile token or as a staff user."""
+
+    def has_permission(self, request, view):
+        return may_read_profiles(request)
+
+class ProfileListView(APIView):
+    """
+    Request profiles captured by ProfilingMiddleware, newest first.
+    Usage: curl -H "X-Profile: $PROFILE_TOKEN" /api/profiles/
+    """
+    permission_classes = [ProfileAccess]
+
+    def get(self, request):
+        return Response({"profiles": list_profiles()})
+
+class ProfileDownloadView(APIView):
+    """
+    One profile artifact: .pstats (python -m pstats, snakeviz) or .folded
+    stacks (flamegraph.pl, speedscope).
+    Usage: /api/profiles/<name>/
+    """
+    permission_classes = [ProfileAccess]
+
+    def get(self, request, name):
+        path = profile_path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(path.open('rb'), as_attachment=True, filename=name)
+
+class IngestView(APIView):
+    """
+    Streaming ingestion gateway for field devices: a long-lived NDJSON body
+    of mixed readings, one per line, e.g.
+    {"type": "air_quality", "city": 1, "date": "2024-01-01", "aqi": 180, ...}
+    Usage: POST /api/ingest/ (Content-Type: application/x-ndjson)
+    Lines are upserted in micro-batches; answers 429 with Retry-After while
+    every writer slot is taken.
+
+    Under WSGI lines are read from the socket as they arrive, and a timer
+    flushes a batch that has waited INGEST_BATCH_SECONDS even while the
+    stream is stalled. Under ASGI Django reads the whole body before the
+    view runs, so nothing streams: batching only bounds the rows per write.
+    """
+    retry_after = 5
+
+    def post(self, request):
+        if not writer_slots.acquire(blocking=False):
+            raise Throttled(wait=self.retry_after, detail="All ingest writers are busy, retry later.")
+        try:
+            batcher = MicroBatcher().start()
+            try:
+                lines = iter(request._request.readline, b'')
+                for line_no, line in enumerate(lines, 1):
+                    batcher.add_line(line_no, line)
+            finally:
+                batcher.stop()
+            report = batcher.close()
+        finally:
+            writer_slots.release()
+        return Response(report)
 
 from api.services.weather_sync import sync_all_cities_weather
 
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware', # gzip, or brotli when installed and accepted
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Added CORS Middleware
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +46,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware', # opt-in, see PROFILE_* below
+    'api.middleware.ServerTimingMiddleware', # keep last: times the view itself
 ]
 
 ROOT_URLCONF = 'myproject.urls'
@@ -90,6 +93,125 @@ else:
     }
 
 
+# Django REST Framework
+# orjson-backed JSON (falls back to the stdlib encoder when orjson is missing);
+# responses are compressed by api.middleware.CompressionMiddleware.
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Cache
+# Per-city responses are cached under a data version (see api/services/versioning.py).
+# Point REDIS_URL at a shared Redis so every worker sees the same entries and counters.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'urbannexus',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+CITY_CACHE_TIMEOUT = int(os.getenv('CITY_CACHE_TIMEOUT', '3600'))
+
+# Concurrent misses on the same cached result are computed once: 'thread' collapses
+# them within a worker process, 'cache' also across processes through the (Redis) cache.
+CITY_SINGLE_FLIGHT = os.getenv('CITY_SINGLE_FLIGHT', 'thread')
+CITY_SINGLE_FLIGHT_TIMEOUT = int(os.getenv('CITY_SINGLE_FLIGHT_TIMEOUT', '30'))
+CITY_SINGLE_FLIGHT_POLL = 0.05
+
+
+# Admission control (api/services/admission.py)
+# Per class of expensive endpoints: concurrent calls per process, how many more may
+# queue for a slot and for how long (seconds) before answering 503 + Retry-After.
+# A queued request holds its worker thread, so keep the queue to a couple of requests
+# and the wait short; with a queue size of 0 a busy class rejects straight away.
+
+ADMISSION_CLASSES = {
+    'analytics': {
+        'limit': int(os.getenv('ANALYTICS_CONCURRENCY', '4')),
+        'queue_size': int(os.getenv('ANALYTICS_QUEUE_SIZE', '2')),
+        'max_wait': float(os.getenv('ANALYTICS_QUEUE_WAIT', '0.5')),
+    },
+}
+
+
+# City change events (/api/events/, see api/services/events.py)
+# Writes of other worker processes and of the ETL loader reach open streams through
+# polling the city_data_version table every CITY_EVENTS_POLL seconds; 0 disables it.
+
+CITY_EVENTS_POLL = float(os.getenv('CITY_EVENTS_POLL', '2'))
+
+
+# Streaming ingestion (/api/ingest/, see api/services/ingest.py)
+# Concurrent streams per process, and the micro-batch flush thresholds.
+
+INGEST_MAX_STREAMS = int(os.getenv('INGEST_MAX_STREAMS', '4'))
+INGEST_BATCH_ROWS = int(os.getenv('INGEST_BATCH_ROWS', '500'))
+INGEST_BATCH_SECONDS = float(os.getenv('INGEST_BATCH_SECONDS', '1.0'))
+
+
+# Static JSON snapshots (api/services/static_snapshots.py)
+# Directory served by a static file server (e.g. nginx with gzip_static); the dashboard
+# of each city, the city list and the overview are rewritten there after every write,
+# by a background thread that publishes each burst of writes (STATIC_SNAPSHOT_DELAY
+# seconds) at once. A delay of 0 publishes in the writing request instead, the default
+# on SQLite, which takes one writer at a time. Empty root disables publishing.
+
+STATIC_SNAPSHOT_ROOT = os.getenv('STATIC_SNAPSHOT_ROOT', '')
+STATIC_SNAPSHOT_DELAY = float(os.getenv(
+    'STATIC_SNAPSHOT_DELAY', '0' if DATABASES['default']['ENGINE'].endswith('sqlite3') else '1'
+))
+
+
+# Request instrumentation (api.middleware.ServerTimingMiddleware)
+# Every /api/ request gets a Server-Timing header and a JSON line on the `api.timing`
+# logger; requests running more than QUERY_BUDGET queries are logged as warnings.
+
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '20'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+
+# Request profiling (api.middleware.ProfilingMiddleware, api/services/profiling.py)
+# Requests sent with `X-Profile: <PROFILE_TOKEN>` (or ?profile= by staff users) run under
+# cProfile, or the stack sampler with `X-Profile-Mode: sample`; PROFILE_SAMPLE_RATE (0..1)
+# samples that share of all API requests. Artifacts are kept in PROFILE_ROOT (newest
+# PROFILE_KEEP) and served by /api/profiles/. An empty token disables the header.
+
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_ROOT = os.getenv('PROFILE_ROOT', str(BASE_DIR / 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '200'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
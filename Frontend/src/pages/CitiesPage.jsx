@@ -4,7 +4,7 @@ import { MapPin, Users, Activity, Filter, Search } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import ParticleBackground from '../components/ParticleBackground';
-import { getCities } from '../services/api';
+import { getOverview } from '../services/api';
 
 const CitiesPage = () => {
     const [cities, setCities] = useState([]);
@@ -15,7 +15,7 @@ const CitiesPage = () => {
     useEffect(() => {
         const fetchCities = async () => {
             try {
-                const data = await getCities();
+                const data = await getOverview();
                 setCities(data);
             } catch (error) {
                 console.error("Failed to load cities", error);
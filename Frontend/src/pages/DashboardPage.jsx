@@ -7,7 +7,10 @@ import {
 } from 'lucide-react';
 import Navbar from '../components/Navbar';
 import ParticleBackground from '../components/ParticleBackground';
-import { getDashboardData, syncLiveWeather } from '../services/api';
+import { getDashboardData, subscribeCityEvents, syncLiveWeather } from '../services/api';
+
+// Days of history requested for the sparklines
+const HISTORY_DAYS = 14;
 
 // --- Sub-components ---
 
@@ -153,6 +156,8 @@ const DashboardPage = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [isSyncing, setIsSyncing] = useState(false);
+    // Bumped by server-sent city-update events to refetch in place
+    const [refreshCount, setRefreshCount] = useState(0);
 
     // Function to calculate logical status labels
     const getStatus = (val, type) => {
@@ -166,9 +171,10 @@ const DashboardPage = () => {
         setIsSyncing(true);
         try {
             await syncLiveWeather();
-            // In a real app we would wait a moment or confirm
+            // Refetch in place; don't rely on the city-update event, which needs the
+            // ASGI server (/api/events/ answers 503 under runserver)
+            setRefreshCount((count) => count + 1);
             alert("Live Weather Synced & Updated!");
-            window.location.reload();
         } catch (err) {
             alert("Sync Failed: " + err.message);
         } finally {
@@ -178,12 +184,15 @@ const DashboardPage = () => {
 
     useEffect(() => {
         const fetchData = async () => {
-            setLoading(true);
+            if (refreshCount === 0) setLoading(true);
             try {
-                const apiData = await getDashboardData(cityId);
+                const apiData = await getDashboardData(cityId, { history: HISTORY_DAYS });
 
                 // Transform API data to Component format
                 const stats = apiData.latest_stats;
+                const history = apiData.history || {};
+                // Real trend arrays; fall back to the latest value when a domain has no history
+                const trend = (series, key, latest) => (series && series[key] && series[key].length ? series[key] : [latest, latest]);
 
                 // Determine timestamps
                 const weatherTime = stats.weather_updated_at ? new Date(stats.weather_updated_at).toLocaleString() : "N/A";
@@ -205,7 +214,7 @@ const DashboardPage = () => {
                         color: "text-sky-400",
                         bg: "bg-sky-500/10",
                         icon: Thermometer,
-                        chartData: [stats.temperature - 2, stats.temperature - 1, stats.temperature]
+                        chartData: trend(history.weather, 'temperature', stats.temperature)
                     },
                     aqi: {
                         val: stats.aqi,
@@ -217,7 +226,7 @@ const DashboardPage = () => {
                         color: stats.aqi > 100 ? "text-rose-400" : "text-emerald-400",
                         bg: stats.aqi > 100 ? "bg-rose-500/10" : "bg-emerald-500/10",
                         icon: Wind,
-                        chartData: [stats.aqi - 10, stats.aqi + 5, stats.aqi]
+                        chartData: trend(history.air_quality, 'aqi', stats.aqi)
                     },
                     traffic: {
                         val: stats.traffic_density,
@@ -229,7 +238,7 @@ const DashboardPage = () => {
                         color: "text-purple-400",
                         bg: "bg-purple-500/10",
                         icon: Car,
-                        chartData: [stats.traffic_density, stats.traffic_density, stats.traffic_density]
+                        chartData: trend(history.traffic, 'traffic_density', stats.traffic_density)
                     },
                     humidity: {
                         val: stats.humidity,
@@ -241,7 +250,7 @@ const DashboardPage = () => {
                         color: "text-blue-400",
                         bg: "bg-blue-500/10",
                         icon: Droplets,
-                        chartData: [stats.humidity, stats.humidity, stats.humidity]
+                        chartData: trend(history.weather, 'humidity', stats.humidity)
                     },
                     agriculture: {
                         val: apiData.recent_crops && apiData.recent_crops.length > 0 ? Number(apiData.recent_crops[0].yield_amount).toFixed(2) : "0.00",
@@ -251,11 +260,12 @@ const DashboardPage = () => {
                         color: "text-amber-400",
                         bg: "bg-amber-500/10",
                         icon: Sprout,
-                        chartData: [4, 4.2, 4.5, 4.3, 4.5]
+                        chartData: trend(history.agriculture, 'yield_amount', 0)
                     },
                     health: {
                         score: 100 - Math.round(stats.health_risk),
                         status: stats.risk_level || "Unknown",
+                        chartData: trend(history.health, 'health_risk_score', stats.health_risk).map(risk => 100 - Math.round(risk)),
                         desc: `Risk Factor: ${stats.risk_level || "Unknown"}. Calculated from AQI (${stats.aqi}) & Traffic.`
                     },
                     insight: `Current environment analysis: Air quality is ${(aqiStatus || "unknown").toLowerCase()} with ${(trafficStatus || "unknown").toLowerCase()} traffic flow. Health risk is ${(stats.risk_level || "unknown").toLowerCase()}. Recommended to monitor PM2.5 levels closely.`,
@@ -275,7 +285,12 @@ const DashboardPage = () => {
         };
 
         if (cityId) fetchData();
+    }, [cityId, refreshCount]);
+
+    useEffect(() => {
         window.scrollTo(0, 0);
+        if (!cityId) return undefined;
+        return subscribeCityEvents(cityId, () => setRefreshCount((count) => count + 1));
     }, [cityId]);
 
     if (loading) return <div className="min-h-screen bg-slate-950 flex items-center justify-center text-cyan-400">Loading City Data...</div>;
@@ -17,9 +17,21 @@ export const getCities = async () => {
     }
 };
 
-export const getDashboardData = async (cityId) => {
+// Every city with its current risk and latest weather / air_quality / traffic rows.
+export const getOverview = async () => {
     try {
-        const response = await api.get(`/dashboard/?city_id=${cityId}`);
+        const response = await api.get('/overview/');
+        return response.data;
+    } catch (error) {
+        console.error("Error fetching city overview:", error);
+        throw error;
+    }
+};
+
+// Pass { history: N } to also receive N days of per-metric arrays for sparklines.
+export const getDashboardData = async (cityId, params = {}) => {
+    try {
+        const response = await api.get('/dashboard/', { params: { city_id: cityId, ...params } });
         return response.data;
     } catch (error) {
         console.error("Error fetching dashboard data:", error);
@@ -27,9 +39,11 @@ export const getDashboardData = async (cityId) => {
     }
 };
 
-export const getWeather = async () => {
+// Time-series lists are paginated: { next, results }. Pass { city_id, page_size, cursor }
+// and follow `next` for older rows.
+export const getWeather = async (params = {}) => {
     try {
-        const response = await api.get('/weather/');
+        const response = await api.get('/weather/', { params });
         return response.data;
     } catch (error) {
         console.error("Error fetching weather:", error);
@@ -37,9 +51,9 @@ export const getWeather = async () => {
     }
 };
 
-export const getAirQuality = async () => {
+export const getAirQuality = async (params = {}) => {
     try {
-        const response = await api.get('/air-quality/');
+        const response = await api.get('/air-quality/', { params });
         return response.data;
     } catch (error) {
         console.error("Error fetching air quality:", error);
@@ -47,9 +61,9 @@ export const getAirQuality = async () => {
     }
 };
 
-export const getTraffic = async () => {
+export const getTraffic = async (params = {}) => {
     try {
-        const response = await api.get('/traffic/');
+        const response = await api.get('/traffic/', { params });
         return response.data;
     } catch (error) {
         console.error("Error fetching traffic:", error);
@@ -57,9 +71,9 @@ export const getTraffic = async () => {
     }
 };
 
-export const getAgriculture = async () => {
+export const getAgriculture = async (params = {}) => {
     try {
-        const response = await api.get('/agriculture/');
+        const response = await api.get('/agriculture/', { params });
         return response.data;
     } catch (error) {
         console.error("Error fetching agriculture:", error);
@@ -67,9 +81,9 @@ export const getAgriculture = async () => {
     }
 };
 
-export const getHealth = async () => {
+export const getHealth = async (params = {}) => {
     try {
-        const response = await api.get('/health/');
+        const response = await api.get('/health/', { params });
         return response.data;
     } catch (error) {
         console.error("Error fetching health data:", error);
@@ -149,4 +163,12 @@ export const syncLiveWeather = async () => {
     }
 };
 
+// Server-Sent Events: calls onUpdate(event) whenever the city's data changes.
+// Returns a function that closes the stream.
+export const subscribeCityEvents = (cityId, onUpdate) => {
+    const source = new EventSource(`${api.defaults.baseURL}/events/?city_id=${cityId}`);
+    source.addEventListener('city-update', (event) => onUpdate(JSON.parse(event.data)));
+    return () => source.close();
+};
+
 export default api;
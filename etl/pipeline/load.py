@@ -34,9 +34,22 @@ class Loader:
             logger.info(f"Created new city: {city_name} (ID: {city_id})")
             return city_id
 
+    @staticmethod
+    def bump_city_versions(cursor, city_ids):
+        # The API caches responses per city data version; bump it so loaded rows become visible
+        now = datetime.now(timezone.utc)
+        for city_id in sorted(city_ids):
+            cursor.execute("""
+                INSERT INTO city_data_version (city_id, version, updated_at)
+                VALUES (%s, 1, %s)
+                ON CONFLICT (city_id) DO UPDATE
+                SET version = city_data_version.version + 1, updated_at = EXCLUDED.updated_at
+            """, (city_id, now))
+
     @staticmethod
     def load_weather_data(records):
         inserted_count = 0
+        city_ids = set()
         with get_db_cursor(commit=True) as cursor:
             for record in records:
                 if not record: continue
@@ -47,12 +60,15 @@ class Loader:
                     INSERT INTO weather_data (city_id, date, temperature, humidity, rainfall, ingested_at)
                     VALUES (%s, %s, %s, %s, %s, %s)
                 """, (city_id, record['date'], record['temperature'], record['humidity'], record['rainfall'], ingested_at))
+                city_ids.add(city_id)
                 inserted_count += 1
+            Loader.bump_city_versions(cursor, city_ids)
         return inserted_count
 
     @staticmethod
     def load_aqi_data(records):
         inserted_count = 0
+        city_ids = set()
         with get_db_cursor(commit=True) as cursor:
             for record in records:
                 if not record: continue
@@ -63,12 +79,15 @@ class Loader:
                     INSERT INTO air_quality (city_id, date, aqi, pm25, pm10, no2, ingested_at)
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """, (city_id, record['date'], record['aqi'], record['pm25'], record['pm10'], record['no2'], ingested_at))
+                city_ids.add(city_id)
                 inserted_count += 1
+            Loader.bump_city_versions(cursor, city_ids)
         return inserted_count
 
     @staticmethod
     def load_traffic_data(records):
         inserted_count = 0
+        city_ids = set()
         with get_db_cursor(commit=True) as cursor:
             for record in records:
                 if not record: continue
@@ -79,35 +98,45 @@ class Loader:
                     INSERT INTO traffic_data (city_id, date, traffic_density, avg_speed, ingested_at)
                     VALUES (%s, %s, %s, %s, %s)
                 """, (city_id, record['date'], record['traffic_density'], record['avg_speed'], ingested_at))
+                city_ids.add(city_id)
                 inserted_count += 1
+            Loader.bump_city_versions(cursor, city_ids)
         return inserted_count
 
     @staticmethod
     def load_agriculture_data(records):
         inserted_count = 0
+        city_ids = set()
         with get_db_cursor(commit=True) as cursor:
             for record in records:
                 if not record: continue
                 city_id = Loader.get_city_id(record['city_name'])
+                ingested_at = datetime.now(timezone.utc)
                 
                 cursor.execute("""
-                    INSERT INTO agriculture_data (city_id, date, crop_type, yield, soil_moisture)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (city_id, record['date'], record['crop_type'], record['yield'], record['soil_moisture']))
+                    INSERT INTO agriculture_data (city_id, date, crop_type, yield, soil_moisture, ingested_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (city_id, record['date'], record['crop_type'], record['yield'], record['soil_moisture'], ingested_at))
+                city_ids.add(city_id)
                 inserted_count += 1
+            Loader.bump_city_versions(cursor, city_ids)
         return inserted_count
 
     @staticmethod
     def load_health_data(records):
         inserted_count = 0
+        city_ids = set()
         with get_db_cursor(commit=True) as cursor:
             for record in records:
                 if not record: continue
                 city_id = Loader.get_city_id(record['city_name'])
+                ingested_at = datetime.now(timezone.utc)
                 
                 cursor.execute("""
-                    INSERT INTO health_index (city_id, date, health_risk_score, risk_level)
-                    VALUES (%s, %s, %s, %s)
-                """, (city_id, record['date'], record['health_risk_score'], record['risk_level']))
+                    INSERT INTO health_index (city_id, date, health_risk_score, risk_level, ingested_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (city_id, record['date'], record['health_risk_score'], record['risk_level'], ingested_at))
+                city_ids.add(city_id)
                 inserted_count += 1
+            Loader.bump_city_versions(cursor, city_ids)
         return inserted_count
@@ -64,7 +64,8 @@ def create_tables():
             date DATE,
             crop_type VARCHAR(50),
             yield REAL,
-            soil_moisture REAL
+            soil_moisture REAL,
+            ingested_at TIMESTAMP
         )
         """,
         """
@@ -73,9 +74,20 @@ def create_tables():
             city_id INT REFERENCES city(city_id),
             date DATE,
             health_risk_score REAL,
-            risk_level VARCHAR(10)
+            risk_level VARCHAR(10),
+            ingested_at TIMESTAMP
         )
+        """,
         """
+        CREATE TABLE IF NOT EXISTS city_data_version (
+            city_id INT PRIMARY KEY REFERENCES city(city_id),
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+        )
+        """,
+        # Tables created before ingested_at was added to these two
+        "ALTER TABLE agriculture_data ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP",
+        "ALTER TABLE health_index ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP"
     ]
     
     try: